@@ -0,0 +1,8 @@
+import os
+
+import django
+
+
+def setup():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'form_builder.settings')
+    django.setup()
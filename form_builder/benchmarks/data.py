@@ -0,0 +1,132 @@
+"""
+Synthetic data for the benchmarks: users, forms with `fields_per_type`
+fields of every FormType, and responses with realistic answers. Rows are
+written with bulk_create, so a dataset of tens of thousands of answers
+builds in seconds.
+"""
+import io
+import random
+from datetime import date, timedelta
+from typing import Dict, List, NamedTuple
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+
+WORDS = (
+    'alpha bravo charlie delta echo foxtrot golf hotel india juliet kilo lima mike november oscar papa '
+    'quebec romeo sierra tango uniform victor whiskey xray yankee zulu'
+).split()
+CHOICES = ('Red', 'Green', 'Blue', 'Yellow', 'Purple')
+PASSWORD = 'benchmark-password'
+BATCH_SIZE = 1000
+
+
+class Dataset(NamedTuple):
+    users: List[Dict[str, str]]
+    forms: List[str]
+    fields: Dict[str, List[str]]
+    responses: Dict[str, List[str]]
+    upload_name: str
+
+
+def sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def png_bytes(size=(320, 240)):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (40, 120, 200)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def answer_rows(rng, response, field, choices, upload_name):
+    from forms.models import CheckBox, ChoiceAnswer, DateTable, FileTable, LongAnswer, Payment, ShortAnswer
+    from utils.types import FormType
+
+    if field.type == FormType.SHORT_ANSWER:
+        return [ShortAnswer(response=response, formfield=field, value=sentence(rng, 3))]
+    if field.type == FormType.LONG_ANSWER:
+        return [LongAnswer(response=response, formfield=field, value='. '.join(sentence(rng, 12) for _ in range(4)))]
+    if field.type in (FormType.RADIO_BUTTON, FormType.DROPDOWN):
+        return [ChoiceAnswer(response=response, formfield=field, value=rng.choice(choices))]
+    if field.type == FormType.MULTIPLE_CHOICE:
+        return [ChoiceAnswer(response=response, formfield=field, value=text) for text in rng.sample(choices, rng.randint(1, 3))]
+    if field.type == FormType.CHECKBOX:
+        return [CheckBox(response=response, formfield=field, value=rng.random() < 0.7)]
+    if field.type == FormType.DATE:
+        return [DateTable(response=response, formfield=field, value=date.today() - timedelta(days=rng.randint(0, 730)))]
+    if field.type == FormType.FILE_UPLOAD:
+        return [FileTable(response=response, formfield=field, value=upload_name)]
+    if field.type == FormType.UPI_PAYMENT:
+        return [Payment(response=response, formfield=field, value=upload_name)]
+    return []
+
+
+def generate(users=2, forms_per_user=2, fields_per_type=1, responses=200, seed=0):
+    """
+    Create the dataset in the current database and return the ids the
+    benchmark routes need. Every user's password is PASSWORD.
+    """
+    from forms.answers import ANSWER_MODELS, MULTI_VALUED_TYPES, build_snapshot
+    from forms.models import Choice, Form, FormField, FormResponse, PaymentRequest, ORDER_STEP
+    from forms.storage import content_addressed_storage
+    from user.models import User
+    from utils.types import FormType
+
+    rng = random.Random(seed)
+    password = make_password(PASSWORD)
+    # Every upload answer references one stored image, as identical uploads do
+    upload_name = content_addressed_storage.save('formfiles/benchmark.png', ContentFile(png_bytes()))
+
+    user_rows = [User(username=f'bench{i}', email=f'bench{i}@example.com', password=password) for i in range(users)]
+    User.objects.bulk_create(user_rows)
+    form_rows = [
+        Form(user=user, title=f'Benchmark form {i}', description=sentence(rng, 30))
+        for user in user_rows for i in range(forms_per_user)
+    ]
+    Form.objects.bulk_create(form_rows)
+
+    field_rows, choice_rows, payment_rows = [], [], []
+    fields_by_form = {}
+    for form in form_rows:
+        fields = []
+        for index, (field_type, _) in enumerate(FormType.CHOICES * fields_per_type):
+            field = FormField(form=form, type=field_type, label=sentence(rng, 4), is_required=index % 3 == 0, order=(index + 1) * ORDER_STEP)
+            fields.append(field)
+            if field_type in (FormType.RADIO_BUTTON, FormType.DROPDOWN, FormType.MULTIPLE_CHOICE):
+                choice_rows.extend(Choice(formfield=field, text=text) for text in CHOICES)
+            elif field_type == FormType.UPI_PAYMENT:
+                payment_rows.append(PaymentRequest(formfield=field, upi_id='bench@upi', amount=rng.randint(10, 500)))
+        fields_by_form[form] = fields
+        field_rows.extend(fields)
+    FormField.objects.bulk_create(field_rows, batch_size=BATCH_SIZE)
+    Choice.objects.bulk_create(choice_rows, batch_size=BATCH_SIZE)
+    PaymentRequest.objects.bulk_create(payment_rows, batch_size=BATCH_SIZE)
+
+    responses_by_form = {}
+    for form, fields in fields_by_form.items():
+        response_ids = []
+        multi_valued = {str(field.pk) for field in fields if field.type in MULTI_VALUED_TYPES}
+        for start in range(0, responses, BATCH_SIZE):
+            response_rows = [FormResponse(form=form) for _ in range(min(BATCH_SIZE, responses - start))]
+            rows_by_model = {model: [] for model in set(ANSWER_MODELS.values())}
+            for response in response_rows:
+                rows = [row for field in fields for row in answer_rows(rng, response, field, CHOICES, upload_name)]
+                for row in rows:
+                    rows_by_model[type(row)].append(row)
+                response.answers = build_snapshot(rows, multi_valued)
+            FormResponse.objects.bulk_create(response_rows)
+            for model, rows in rows_by_model.items():
+                model.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+            response_ids.extend(str(response.pk) for response in response_rows)
+        responses_by_form[str(form.pk)] = response_ids
+
+    return Dataset(
+        users=[{'id': str(user.pk), 'username': user.username, 'password': PASSWORD} for user in user_rows],
+        forms=[str(form.pk) for form in form_rows],
+        fields={str(form.pk): [str(field.pk) for field in fields] for form, fields in fields_by_form.items()},
+        responses=responses_by_form,
+        upload_name=upload_name,
+    )
@@ -0,0 +1,68 @@
+"""
+Insert throughput and on-disk size of an answer table keyed by 36-character
+random UUID strings (the previous key) against 16-byte time-ordered UUIDv7
+keys (utils.ids.CompactUUIDField). The table is clustered on its primary
+key (SQLite WITHOUT ROWID, like InnoDB) and has a secondary index on its
+response foreign key, as the answer tables do.
+
+    python -m benchmarks.ids [rows]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+
+from utils.ids import uuid7
+
+BATCH_SIZE = 1000
+
+VARIANTS = {
+    'char(36) uuid4': ('TEXT', lambda: str(uuid.uuid4())),
+    'char(36) uuid7': ('TEXT', lambda: str(uuid7())),
+    'binary(16) uuid7': ('BLOB', lambda: uuid7().bytes),
+}
+
+
+def run(column_type, new_id, rows, path):
+    connection = sqlite3.connect(path, isolation_level=None)
+    connection.execute(
+        f"CREATE TABLE answer (id {column_type} PRIMARY KEY, response_id {column_type} NOT NULL, "
+        f"formfield_id {column_type} NOT NULL, value TEXT NOT NULL) WITHOUT ROWID"
+    )
+    connection.execute("CREATE INDEX answer_response ON answer (response_id, formfield_id)")
+    formfield_id = new_id()
+
+    start = time.perf_counter()
+    for offset in range(0, rows, BATCH_SIZE):
+        # Ten answers per response, as a ten-field form produces
+        batch = []
+        for _ in range(min(BATCH_SIZE, rows - offset) // 10 or 1):
+            response_id = new_id()
+            batch.extend((new_id(), response_id, formfield_id, 'answer') for _ in range(10))
+        connection.execute("BEGIN")
+        connection.executemany("INSERT INTO answer VALUES (?, ?, ?, ?)", batch)
+        connection.execute("COMMIT")
+    elapsed = time.perf_counter() - start
+
+    try:
+        sizes = dict(connection.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name"))
+    except sqlite3.OperationalError:
+        page_size = connection.execute("PRAGMA page_size").fetchone()[0]
+        sizes = {'answer': connection.execute("PRAGMA page_count").fetchone()[0] * page_size, 'answer_response': 0}
+    count = connection.execute("SELECT COUNT(*) FROM answer").fetchone()[0]
+    connection.close()
+    return count, elapsed, sizes.get('answer', 0), sizes.get('answer_response', 0)
+
+
+def main(rows=200000):
+    directory = tempfile.mkdtemp(prefix='form-builder-ids-')
+    print(f"{'key':<18}{'rows/s':>10}{'table MB':>10}{'index MB':>10}{'bytes/row':>11}")
+    for number, (name, (column_type, new_id)) in enumerate(VARIANTS.items()):
+        count, elapsed, table, index = run(column_type, new_id, rows, os.path.join(directory, f'variant{number}.sqlite3'))
+        print(f"{name:<18}{count / elapsed:>10.0f}{table / 2**20:>10.1f}{index / 2**20:>10.1f}{(table + index) / count:>11.1f}")
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,357 @@
+"""
+Load and latency benchmark of every route in forms/urls.py and
+user/urls.py. Builds a synthetic dataset (benchmarks.data) in a fresh
+SQLite database, drives each route with a pool of in-process test clients,
+and reports throughput and p50/p95/p99 latency per route. Results can be
+saved as a baseline and later runs compared against it.
+
+    python -m benchmarks.load [--requests 200] [--concurrency 8] [--responses 500]
+                              [--routes form-list,form-response] [--output results.json]
+                              [--baseline benchmarks/baseline.json] [--tolerance 0.15]
+
+Exits with status 1 when a route regressed beyond the tolerance.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, NamedTuple, Optional
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+
+class Route(NamedTuple):
+    name: str
+    method: str
+    # build(context, index) -> (path, client kwargs); runs before the timer starts
+    build: Callable
+    auth: bool = False
+    expected_status: int = 200
+    # Cap for routes that are slow by design (password hashing)
+    max_requests: Optional[int] = None
+    # Override for routes whose writes SQLite cannot run concurrently
+    concurrency: Optional[int] = None
+
+
+def configure(database=None):
+    """
+    Point the settings at a throwaway SQLite database and media directory,
+    then set Django up and create the schema.
+    """
+    work_dir = tempfile.mkdtemp(prefix='form-builder-bench-')
+    os.environ.update({
+        'SECRET_KEY': os.environ.get('SECRET_KEY', 'benchmark-secret-key'),
+        'DATABASE_ENGINE': 'django.db.backends.sqlite3',
+        'DATABASE_NAME': database or os.path.join(work_dir, 'db.sqlite3'),
+        'DATABASE_USER': '',
+        'DATABASE_PASSWORD': '',
+        'DATABASE_HOST': '',
+        'DATABASE_PORT': '',
+    })
+    from benchmarks import setup
+
+    setup()
+
+    from django.conf import settings
+    from django.core.management import call_command
+
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ['testserver']
+    settings.MEDIA_ROOT = os.path.join(work_dir, 'media')
+    settings.SUBMISSION_QUEUE_PATH = os.path.join(work_dir, 'submission_queue.sqlite3')
+    settings.DATABASES['default'].setdefault('OPTIONS', {})['timeout'] = 30
+    logging.getLogger('form_builder.requests').setLevel(logging.ERROR)
+    call_command('migrate', run_syncdb=True, verbosity=0)
+
+    from django.db import connection
+
+    # WAL lets the readers run while one of the clients writes
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode=WAL')
+
+
+class Context:
+    """
+    Ids and tokens the route builders draw from, resolved once after the
+    dataset is generated.
+    """
+
+    def __init__(self, dataset):
+        from forms.models import Choice, FormField
+        from forms.queue import submission_queue
+        from user.models import User
+        from utils.types import FormType
+        from utils.utils import generate_jwt
+
+        self.dataset = dataset
+        self.users = list(User.objects.filter(pk__in=[user['id'] for user in dataset.users]).order_by('username'))
+        self.user = self.users[0]
+        self.access_token, self.refresh_token = generate_jwt(self.user)
+        self.form_id = next(form_id for form_id in dataset.forms if FormField.objects.filter(form_id=form_id, form__user=self.user).exists())
+        self.response_ids = dataset.responses[self.form_id]
+        self.fields = list(FormField.objects.filter(form_id=self.form_id).order_by('order').values_list('id', 'type'))
+        self.field_ids = [field_id for field_id, _ in self.fields]
+        self.short_field_id = next(field_id for field_id, field_type in self.fields if field_type == FormType.SHORT_ANSWER)
+        self.dropdown_field_id = next(field_id for field_id, field_type in self.fields if field_type == FormType.DROPDOWN)
+        choices = {}
+        for field_id, choice_id in Choice.objects.filter(formfield_id__in=self.field_ids).order_by('text').values_list('formfield_id', 'id'):
+            choices.setdefault(field_id, []).append(choice_id)
+        self.dropdown_choice_id = choices[self.dropdown_field_id][0]
+        self.submission = self.build_submission(choices)
+        self.receipt = submission_queue.enqueue({'form': self.form_id, 'form_fields': {self.short_field_id: 'queued'}})
+        self.run_id = uuid.uuid4().hex[:8]
+        self.lock = threading.Lock()
+
+    def build_submission(self, choices):
+        from utils.types import FormType
+
+        values = {
+            FormType.SHORT_ANSWER: lambda field_id: 'Ada Lovelace',
+            FormType.LONG_ANSWER: lambda field_id: 'A longer answer with a few sentences. ' * 4,
+            FormType.RADIO_BUTTON: lambda field_id: choices[field_id][0],
+            FormType.DROPDOWN: lambda field_id: choices[field_id][1],
+            FormType.MULTIPLE_CHOICE: lambda field_id: json.dumps(choices[field_id][:2]),
+            FormType.CHECKBOX: lambda field_id: 'true',
+            FormType.DATE: lambda field_id: '2024-05-17',
+        }
+        data = {'form': self.form_id}
+        for field_id, field_type in self.fields:
+            if field_type in values:
+                data[f'form_fields[{field_id}]'] = values[field_type](field_id)
+        return data
+
+    def auth(self, token=None):
+        return {'HTTP_AUTHORIZATION': f'Bearer {token or self.access_token}'}
+
+    def new_form(self):
+        from forms.models import Form
+
+        return Form.objects.create(user=self.user, title='Disposable form')
+
+    def new_field(self):
+        from forms.models import FormField
+        from utils.types import FormType
+
+        # FormField.save appends after the current last field; serialize the writers
+        with self.lock:
+            return FormField.objects.create(form_id=self.form_id, type=FormType.SHORT_ANSWER, label='Disposable field', is_required=False)
+
+
+def json_body(data):
+    return {'data': json.dumps(data), 'content_type': 'application/json'}
+
+
+def build_routes():
+    def reorder(ctx, i):
+        from forms.models import FormField
+
+        field_ids = list(FormField.objects.filter(form_id=ctx.form_id).order_by('order').values_list('id', flat=True))
+        return f'/api/forms/{ctx.form_id}/reorder_fields/', json_body({'fields': field_ids[1:] + field_ids[:1]})
+
+    def delete_field(ctx, i):
+        field = ctx.new_field()
+        return f'/api/forms/{ctx.form_id}/delete_field/{field.pk}/', {}
+
+    def logout(ctx, i):
+        from user.models import User
+        from utils.utils import generate_jwt
+
+        # Tokens issued to one user within the same second are identical, so
+        # every logout gets a user of its own
+        user = User.objects.create(username=f'logout-{ctx.run_id}-{i}', email=f'logout-{ctx.run_id}-{i}@example.com')
+        access_token, refresh_token = generate_jwt(User.objects.get(pk=user.pk))
+        return '/api/user/logout/', {'data': {'refreshToken': refresh_token}, **ctx.auth(access_token)}
+
+    return [
+        Route('form-list', 'get', lambda ctx, i: ('/api/forms/', {}), auth=True),
+        Route('form-create', 'post', lambda ctx, i: ('/api/forms/create/', {'data': {'title': f'Form {i}', 'description': 'Created by the benchmark'}}), auth=True),
+        Route('form-view', 'get', lambda ctx, i: (f'/api/forms/view/{ctx.form_id}/', {})),
+        Route('form-submit', 'post', lambda ctx, i: (f'/api/forms/view/{ctx.form_id}/', {'data': ctx.submission})),
+        Route('view-response', 'get', lambda ctx, i: ('/api/forms/view_response/', {'data': {'responseId': ctx.response_ids[i % len(ctx.response_ids)]}})),
+        Route('form-response', 'get', lambda ctx, i: ('/api/forms/responses/', {'data': {'formId': ctx.form_id, 'limit': 50}})),
+        Route('form-response-filtered', 'get', lambda ctx, i: ('/api/forms/responses/', {'data': {'formId': ctx.form_id, f'filter[{ctx.dropdown_field_id}]': ctx.dropdown_choice_id}})),
+        Route('submission-metrics', 'get', lambda ctx, i: ('/api/forms/submissions/metrics/', {}), auth=True),
+        Route('submission-status', 'get', lambda ctx, i: (f'/api/forms/submissions/{ctx.receipt}/', {})),
+        Route('form-derivative', 'get', lambda ctx, i: (f'/api/forms/derivatives/thumb/{ctx.dataset.upload_name}', {})),
+        Route('form-detail', 'get', lambda ctx, i: (f'/api/forms/{ctx.form_id}/', {}), auth=True),
+        Route('form-update', 'put', lambda ctx, i: (f'/api/forms/{ctx.form_id}/update/', json_body({'title': f'Renamed {i}'})), auth=True),
+        Route('form-delete', 'delete', lambda ctx, i: (f'/api/forms/{ctx.new_form().pk}/delete/', {}), auth=True),
+        Route('add-field', 'post', lambda ctx, i: (f'/api/forms/{ctx.form_id}/add_field/', {'data': {'type': 'dropdown', 'label': f'Field {i}', 'is_required': 'false', 'choices': ['One', 'Two', 'Three']}}), auth=True),
+        Route('edit-field', 'put', lambda ctx, i: (f'/api/forms/{ctx.form_id}/edit_field/{ctx.short_field_id}/', json_body({'type': 'short_answer', 'label': f'Name {i}', 'is_required': True})), auth=True),
+        Route('delete-field', 'delete', delete_field, auth=True),
+        # Rewrites the order of every field of the form in one transaction
+        Route('reorder-fields', 'put', reorder, auth=True, concurrency=1),
+        Route('form-export', 'get', lambda ctx, i: (f'/api/forms/{ctx.form_id}/export/', {'data': {'file_format': 'csv'}}), auth=True),
+        Route('form-analytics', 'get', lambda ctx, i: (f'/api/forms/{ctx.form_id}/analytics/', {}), auth=True),
+        Route('user-register', 'post', lambda ctx, i: ('/api/user/register/', {'data': {'username': f'load-{ctx.run_id}-{i}', 'email': f'load-{ctx.run_id}-{i}@example.com', 'password': 'load-password'}}), max_requests=20),
+        Route('user-auth', 'post', lambda ctx, i: ('/api/user/auth/', {'data': {'username': ctx.user.username, 'password': ctx.dataset.users[0]['password']}}), max_requests=20),
+        Route('user-access-token', 'post', lambda ctx, i: ('/api/user/get-access-token/', {'data': {'refreshToken': ctx.refresh_token}})),
+        Route('user-logout', 'post', logout),
+    ]
+
+
+def percentile(sorted_values, pct):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, min(len(sorted_values), round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies, errors, wall_time):
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        'requests': count,
+        'errors': errors,
+        'throughput': round(count / wall_time, 1) if wall_time else 0.0,
+        'mean_ms': round(sum(latencies) / count * 1000, 3) if count else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def run_route(ctx, route, requests, concurrency, warmup):
+    from django.db import connections
+    from django.test import Client
+
+    total = min(requests, route.max_requests or requests)
+    counter = iter(range(warmup + total))
+    counter_lock = threading.Lock()
+    latencies, errors = [], []
+
+    def worker():
+        client = Client(raise_request_exception=False)
+        try:
+            while True:
+                with counter_lock:
+                    index = next(counter, None)
+                if index is None:
+                    return
+                path, kwargs = route.build(ctx, index)
+                if route.auth:
+                    kwargs = {**ctx.auth(), **kwargs}
+                start = time.perf_counter()
+                response = getattr(client, route.method)(path, **kwargs)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                elapsed = time.perf_counter() - start
+                if index >= warmup:
+                    latencies.append(elapsed)
+                    if response.status_code != route.expected_status:
+                        errors.append(response.status_code)
+        finally:
+            connections.close_all()
+
+    # Warm-up requests are taken first from the shared counter and not recorded
+    start = time.perf_counter()
+    concurrency = route.concurrency or concurrency
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    return summarize(latencies, len(errors), time.perf_counter() - start)
+
+
+def compare(results, baseline, tolerance):
+    """
+    Print each route's change against the baseline and return the names of
+    routes whose p95 latency or throughput regressed beyond `tolerance`.
+    """
+    regressions = []
+    print(f"\n{'route':<24}{'p95 base':>10}{'p95 now':>10}{'change':>9}{'rps base':>10}{'rps now':>10}{'change':>9}")
+    for name, current in results['routes'].items():
+        previous = baseline.get('routes', {}).get(name)
+        if previous is None:
+            print(f'{name:<24}{"(new)":>10}')
+            continue
+        p95_change = current['p95_ms'] / previous['p95_ms'] - 1 if previous['p95_ms'] else 0.0
+        rps_change = current['throughput'] / previous['throughput'] - 1 if previous['throughput'] else 0.0
+        regressed = p95_change > tolerance or rps_change < -tolerance
+        if regressed:
+            regressions.append(name)
+        print(
+            f"{name:<24}{previous['p95_ms']:>10.2f}{current['p95_ms']:>10.2f}{p95_change:>+9.1%}"
+            f"{previous['throughput']:>10.1f}{current['throughput']:>10.1f}{rps_change:>+9.1%}{'  REGRESSED' if regressed else ''}"
+        )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200, help='timed requests per route')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent in-process clients')
+    parser.add_argument('--warmup', type=int, default=5, help='untimed requests per route')
+    parser.add_argument('--users', type=int, default=2)
+    parser.add_argument('--forms', type=int, default=2, help='forms per user')
+    parser.add_argument('--fields', type=int, default=1, help='fields of each FormType per form')
+    parser.add_argument('--responses', type=int, default=500, help='responses per form')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--routes', help='comma separated route names to run (default: all)')
+    parser.add_argument('--database', help='SQLite file to build the dataset in (default: a temporary file)')
+    parser.add_argument('--output', help='write the results as JSON to this path')
+    parser.add_argument('--baseline', help=f'compare against this results file (e.g. {os.path.relpath(BASELINE_PATH)})')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='allowed relative regression (default 0.15)')
+    args = parser.parse_args(argv)
+
+    configure(args.database)
+
+    import django
+    from benchmarks.data import generate
+
+    started = time.perf_counter()
+    dataset = generate(users=args.users, forms_per_user=args.forms, fields_per_type=args.fields, responses=args.responses, seed=args.seed)
+    print(f'generated {len(dataset.forms)} forms with {args.responses} responses each in {time.perf_counter() - started:.1f}s')
+    ctx = Context(dataset)
+
+    routes = build_routes()
+    if args.routes:
+        selected = set(args.routes.split(','))
+        routes = [route for route in routes if route.name in selected]
+
+    results = {
+        'meta': {
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'responses': args.responses,
+            'fields': args.fields,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'platform': platform.platform(),
+        },
+        'routes': {},
+    }
+    print(f"{'route':<24}{'reqs':>6}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for route in routes:
+        summary = run_route(ctx, route, args.requests, args.concurrency, args.warmup)
+        results['routes'][route.name] = summary
+        print(
+            f"{route.name:<24}{summary['requests']:>6}{summary['errors']:>8}{summary['throughput']:>9.1f}"
+            f"{summary['p50_ms']:>9.2f}{summary['p95_ms']:>9.2f}{summary['p99_ms']:>9.2f}"
+        )
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+            output.write('\n')
+
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            regressions = compare(results, json.load(baseline), args.tolerance)
+        if regressions:
+            print(f"\nregressed beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""
+Encoding cost of the JSON renderers on real response payloads: DRF's
+JSONRenderer against utils.renderers.FastJSONRenderer, and a cached
+pre-encoded form list spliced into the envelope against decoding and
+encoding it again.
+
+    python -m benchmarks.render [--responses 500] [--repeat 20]
+"""
+import argparse
+import json
+import time
+
+
+def measure(render, data, repeat):
+    render(data)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        content = render(data)
+    return (time.perf_counter() - start) / repeat, len(content)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--responses', type=int, default=500)
+    parser.add_argument('--forms', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    from benchmarks.load import configure
+
+    configure()
+
+    from rest_framework.renderers import JSONRenderer
+    from benchmarks.data import generate
+    from forms.answers import ResponseAnswers
+    from forms.models import Form, FormResponse
+    from forms.serializers import FormDetailSerializer, FormListSerializer, FormResponseSerializer
+    from utils import renderers
+    from utils.renderers import FastJSONRenderer, PreEncodedJSON, dumps
+
+    dataset = generate(users=1, forms_per_user=1, fields_per_type=2, responses=args.responses)
+    owner_id = dataset.users[0]['id']
+    description = Form.objects.get(pk=dataset.forms[0]).description
+    Form.objects.bulk_create(Form(user_id=owner_id, title=f'Listed form {i}', description=description) for i in range(args.forms - 1))
+
+    page = list(FormResponse.objects.order_by('pk'))
+    responses = FormResponseSerializer(page, many=True, context={'answers': ResponseAnswers(page)}).data
+    form = FormDetailSerializer.prefetch(Form.objects.all()).get(pk=dataset.forms[0])
+    detail = FormDetailSerializer(form).data
+    forms = FormListSerializer(FormListSerializer.trim(Form.objects.filter(user_id=owner_id)), many=True).data
+    cached = dumps(forms)
+
+    drf, fast = JSONRenderer(), FastJSONRenderer()
+    cases = [
+        (f'{len(page)} responses', {'statusCode': 200, 'message': 'success', 'response': responses}, None),
+        ('form detail', {'statusCode': 200, 'message': 'success', 'response': detail}, None),
+        (f'{len(forms)} cached forms', {'statusCode': 200, 'message': 'success', 'response': json.loads(cached)},
+         {'statusCode': 200, 'message': 'success', 'response': PreEncodedJSON(cached)}),
+    ]
+
+    print(f"orjson: {'yes' if renderers.orjson is not None else 'no (standard library fallback)'}")
+    print(f"{'payload':<20}{'renderer':<22}{'ms':>9}{'KB':>9}{'speedup':>9}")
+    for name, data, pre_encoded in cases:
+        baseline, size = measure(drf.render, data, args.repeat)
+        rows = [('JSONRenderer', baseline, size), ('FastJSONRenderer', *measure(fast.render, data, args.repeat))]
+        if pre_encoded is not None:
+            rows.append(('FastJSON pre-encoded', *measure(fast.render, pre_encoded, args.repeat)))
+        for renderer, elapsed, size in rows:
+            print(f"{name:<20}{renderer:<22}{elapsed * 1000:>9.2f}{size / 1024:>9.1f}{baseline / elapsed:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
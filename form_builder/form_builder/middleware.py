@@ -1,3 +1,157 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import connections
+from rest_framework.serializers import BaseSerializer
+
+logger = logging.getLogger('form_builder.requests')
+
+_current_metrics = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """
+    Counters for one request: queries issued, time spent in the database,
+    time spent producing serializer data, and the view's declared budget.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+        self.view_name = None
+        self.query_budget = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - start
+
+
+def get_request_metrics():
+    return _current_metrics.get()
+
+
+def get_query_budget(view_func, method):
+    """
+    The query budget a view declares for `method`. `query_budget` is either
+    a number covering every method or a dict keyed by HTTP method.
+    """
+    view_class = getattr(view_func, 'view_class', None) or getattr(view_func, 'cls', None)
+    budget = getattr(view_class, 'query_budget', None)
+    if isinstance(budget, dict):
+        return budget.get(method)
+    return budget
+
+
+def _timed_serializer_data(data):
+    def wrapper(serializer):
+        metrics = _current_metrics.get()
+        if metrics is None:
+            return data.fget(serializer)
+        # Nested and list serializers go through .data again; only time the outermost call
+        metrics.serializer_depth += 1
+        start = time.perf_counter()
+        try:
+            return data.fget(serializer)
+        finally:
+            metrics.serializer_depth -= 1
+            if not metrics.serializer_depth:
+                metrics.serializer_time += time.perf_counter() - start
+    wrapper._request_metrics = True
+    return property(wrapper)
+
+
+if not getattr(BaseSerializer.data.fget, '_request_metrics', False):
+    BaseSerializer.data = _timed_serializer_data(BaseSerializer.data)
+
+
+class RequestMetricsMiddleware:
+    """
+    Record the query count, DB time, serializer time and total time of every
+    request, expose them in a Server-Timing header and log them as one JSON
+    line. Views may declare a `query_budget`; requests above it are logged
+    as warnings.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            with self.wrap_connections(metrics):
+                response = self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+        return self.finish(request, response, metrics, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current_metrics.set(metrics)
+        start = time.perf_counter()
+        # Connections are per thread, and async views run their queries in the
+        # request's sync_to_async thread, so the wrappers are installed there
+        stack = await sync_to_async(self.wrap_connections)(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+            _current_metrics.reset(token)
+        return self.finish(request, response, metrics, time.perf_counter() - start)
+
+    @staticmethod
+    def wrap_connections(metrics):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(metrics))
+        return stack
+
+    def finish(self, request, response, metrics, total):
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.queries} queries"',
+            f'serialize;dur={metrics.serializer_time * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ))
+
+        over_budget = metrics.query_budget is not None and metrics.queries > metrics.query_budget
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': metrics.view_name,
+            'status': response.status_code,
+            'queries': metrics.queries,
+            'query_budget': metrics.query_budget,
+            'db_ms': round(metrics.db_time * 1000, 2),
+            'serializer_ms': round(metrics.serializer_time * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+        }
+        logger.log(logging.WARNING if over_budget else logging.INFO, json.dumps(record), extra={'request_metrics': record})
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = _current_metrics.get()
+        if metrics is not None:
+            metrics.view_name = request.resolver_match.view_name if request.resolver_match else None
+            metrics.query_budget = get_query_budget(view_func, request.method)
+
+
 # import json
 # from django.http import JsonResponse
 # from django.utils.deprecation import MiddlewareMixin
@@ -48,9 +48,13 @@ INSTALLED_APPS = [
 
 CRONJOBS = [
     ('0 */3 * * *', 'user.tasks.cleanup_expired_tokens'),  # Run every 3 hours
+    ('30 2 * * *', 'forms.tasks.rebalance_field_orders'),  # Run daily
+    ('0 4 * * *', 'forms.tasks.sweep_unreferenced_blobs'),  # Run daily
+    ('*/10 * * * *', 'forms.tasks.purge_deleted_forms'),  # Run every 10 minutes
 ]
 
 MIDDLEWARE = [
+    'form_builder.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -65,7 +69,7 @@ MIDDLEWARE = [
 CORS_ALLOW_ALL_ORIGINS = True
 
 ROOT_URLCONF = 'form_builder.urls'
-REST_FRAMEWORK = {"DEFAULT_RENDERER_CLASSES": ("rest_framework.renderers.JSONRenderer",)}
+REST_FRAMEWORK = {"DEFAULT_RENDERER_CLASSES": ("utils.renderers.FastJSONRenderer",)}
 
 TEMPLATES = [
     {
@@ -101,6 +105,28 @@ DATABASES = {
 }
 
 
+# Cache
+# Form schema versions, form lists and derivative render locks live in the
+# default cache and must be seen by every worker, so any deployment with more
+# than one process sets CACHE_LOCATION to a Redis URL. Left empty, each
+# process gets its own in-memory cache, which only suits a single process
+# (development and tests); `manage.py check --deploy` reports it.
+CACHE_LOCATION = decouple.config('CACHE_LOCATION', default='')
+if CACHE_LOCATION:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_LOCATION,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -141,7 +167,17 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Write-behind submission ingestion: when enabled, public submissions are
+# validated, queued under MEDIA_ROOT and answered with a 202 receipt, and
+# `manage.py drain_submissions` writes them to the database.
+SUBMISSION_QUEUE_ENABLED = decouple.config('SUBMISSION_QUEUE_ENABLED', default=False, cast=bool)
+SUBMISSION_QUEUE_PATH = os.path.join(MEDIA_ROOT, 'submission_queue.sqlite3')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Serve the hot read endpoints with the async views in forms/async_views.py.
+# form_builder/asgi.py turns this on; WSGI deployments keep the APIViews.
+ASYNC_READ_VIEWS = decouple.config('ASYNC_READ_VIEWS', default=False, cast=bool)
@@ -0,0 +1,62 @@
+from django.db.models import Avg, Count, Max, Min
+from django.db.models.functions import Length, TruncMonth
+from utils.types import FormType
+from .models import FormField,FormResponse,ChoiceAnswer,CheckBox,DateTable,ShortAnswer,LongAnswer,FileTable,Payment
+from .schema import CHOICE_TYPES
+
+
+def summarize_form(form_id):
+    """
+    Aggregate the answers of every field of a form in the database. The
+    number of queries is fixed (GROUP BY queries over each answer table plus
+    the fields and the response count), whatever the number of responses.
+    """
+    fields = list(FormField.objects.filter(form_id=form_id).order_by('order').values('id', 'label', 'type'))
+    field_ids = [field['id'] for field in fields]
+    summaries = {field['id']: {**field, 'answered': 0} for field in fields}
+
+    for field in fields:
+        if field['type'] in CHOICE_TYPES:
+            summaries[field['id']]['choices'] = {}
+        elif field['type'] == FormType.CHECKBOX:
+            summaries[field['id']].update(checked=0, unchecked=0)
+        elif field['type'] == FormType.DATE:
+            summaries[field['id']].update(earliest=None, latest=None, by_month={})
+
+    if field_ids:
+        for row in ChoiceAnswer.objects.filter(formfield_id__in=field_ids).values('formfield_id', 'value').annotate(count=Count('id')).order_by():
+            summary = summaries[row['formfield_id']]
+            summary.setdefault('choices', {})[row['value']] = row['count']
+
+        # A multiple choice answer is stored as one row per selected choice
+        for row in ChoiceAnswer.objects.filter(formfield_id__in=field_ids).values('formfield_id').annotate(count=Count('response_id', distinct=True)).order_by():
+            summaries[row['formfield_id']]['answered'] = row['count']
+
+        for row in CheckBox.objects.filter(formfield_id__in=field_ids).values('formfield_id', 'value').annotate(count=Count('id')).order_by():
+            summary = summaries[row['formfield_id']]
+            summary['checked' if row['value'] else 'unchecked'] = row['count']
+            summary['answered'] += row['count']
+
+        for row in DateTable.objects.filter(formfield_id__in=field_ids).values('formfield_id').annotate(count=Count('id'), earliest=Min('value'), latest=Max('value')).order_by():
+            summaries[row['formfield_id']].update(answered=row['count'], earliest=row['earliest'], latest=row['latest'])
+
+        for row in DateTable.objects.filter(formfield_id__in=field_ids).annotate(month=TruncMonth('value')).values('formfield_id', 'month').annotate(count=Count('id')).order_by('month'):
+            summaries[row['formfield_id']].setdefault('by_month', {})[row['month'].strftime('%Y-%m')] = row['count']
+
+        for model in (ShortAnswer, LongAnswer):
+            for row in model.objects.filter(formfield_id__in=field_ids).values('formfield_id').annotate(count=Count('id'), min_length=Min(Length('value')), max_length=Max(Length('value')), avg_length=Avg(Length('value'))).order_by():
+                summaries[row['formfield_id']].update(
+                    answered=row['count'],
+                    min_length=row['min_length'],
+                    max_length=row['max_length'],
+                    avg_length=round(row['avg_length'], 1),
+                )
+
+        for model in (FileTable, Payment):
+            for row in model.objects.filter(formfield_id__in=field_ids).values('formfield_id').annotate(count=Count('id')).order_by():
+                summaries[row['formfield_id']]['answered'] = row['count']
+
+    return {
+        'responses': FormResponse.objects.filter(form_id=form_id).count(),
+        'fields': list(summaries.values()),
+    }
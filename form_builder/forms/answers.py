@@ -0,0 +1,93 @@
+from collections import defaultdict
+from asgiref.sync import sync_to_async
+from utils.types import FormType
+from .models import FormField,ShortAnswer,LongAnswer,ChoiceAnswer,CheckBox,DateTable,FileTable,Payment
+
+ANSWER_MODELS = {
+    FormType.SHORT_ANSWER: ShortAnswer,
+    FormType.LONG_ANSWER: LongAnswer,
+    FormType.RADIO_BUTTON: ChoiceAnswer,
+    FormType.MULTIPLE_CHOICE: ChoiceAnswer,
+    FormType.DROPDOWN: ChoiceAnswer,
+    FormType.CHECKBOX: CheckBox,
+    FormType.DATE: DateTable,
+    FormType.FILE_UPLOAD: FileTable,
+    FormType.UPI_PAYMENT: Payment,
+}
+
+FILE_ANSWER_MODELS = (FileTable, Payment)
+
+
+# Field types answered with several rows, kept as a list of every value
+MULTI_VALUED_TYPES = frozenset([FormType.MULTIPLE_CHOICE])
+
+
+def add_answer(answers, formfield_id, value, multi_valued):
+    if formfield_id in multi_valued:
+        answers.setdefault(formfield_id, []).append(value)
+    else:
+        answers.setdefault(formfield_id, value)
+
+
+def build_snapshot(rows, multi_valued=()):
+    """
+    Build the answer document stored on FormResponse.answers from a response's
+    answer rows, keyed by field id. Fields whose id is in `multi_valued` get
+    the list of all their values. File rows must already be saved to storage.
+    """
+    snapshot = {}
+    for row in rows:
+        value = row.value
+        if isinstance(row, FILE_ANSWER_MODELS):
+            value = value.url if value else None
+        add_answer(snapshot, str(row.formfield_id), value, multi_valued)
+    return snapshot
+
+
+class ResponseAnswers:
+    """
+    Serves the answers of a batch of responses from memory, keyed by response
+    and field id. Responses with an answers snapshot are read from it; the
+    rest are loaded with one query per answer table.
+    """
+
+    def __init__(self, responses, use_snapshots=True):
+        form_ids = {response.form_id for response in responses}
+
+        self.form_fields = defaultdict(list)
+        for field in FormField.objects.filter(form_id__in=form_ids):
+            self.form_fields[field.form_id].append(field)
+
+        self.values = defaultdict(dict)
+        response_ids = []
+        for response in responses:
+            if use_snapshots and response.answers is not None:
+                self.values[response.pk] = response.answers
+            else:
+                response_ids.append(response.pk)
+        if not response_ids:
+            return
+
+        field_types = {field.type for fields in self.form_fields.values() for field in fields}
+        multi_valued = {field.pk for fields in self.form_fields.values() for field in fields if field.type in MULTI_VALUED_TYPES}
+        answer_models = {ANSWER_MODELS[field_type] for field_type in field_types if field_type in ANSWER_MODELS}
+        for model in answer_models:
+            rows = model.objects.filter(response_id__in=response_ids).order_by('pk').values_list('response_id', 'formfield_id', 'value')
+            storage = model._meta.get_field('value').storage if model in FILE_ANSWER_MODELS else None
+            for response_id, formfield_id, value in rows:
+                if storage is not None:
+                    value = storage.url(value) if value else None
+                add_answer(self.values[response_id], formfield_id, value, multi_valued)
+
+    @classmethod
+    async def aload(cls, responses, use_snapshots=True):
+        return await sync_to_async(cls)(responses, use_snapshots)
+
+    def get_form_fields(self, form_id):
+        return self.form_fields.get(form_id, [])
+
+    def get_answers(self, response_id):
+        return self.values.get(response_id, {})
+
+    def get_value(self, response_id, formfield_id):
+        return self.get_answers(response_id).get(formfield_id)
@@ -0,0 +1,139 @@
+"""
+Async versions of the hot read endpoints, routed in place of their APIView
+counterparts when settings.ASYNC_READ_VIEWS is on (form_builder/asgi.py
+turns it on). A slow read then parks a coroutine instead of holding a
+worker thread, so a few processes can hold many concurrent clients.
+"""
+from asgiref.sync import sync_to_async
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.response import Response
+from utils.exception import UnauthorizedAccessException
+from utils.pagination import InvalidCursor,akeyset_paginate,get_page_size
+from utils.permission import JWTUtils
+from utils.renderers import PreEncodedJSON,dumps
+from utils.response import CustomResponse,render_response
+from .answers import ResponseAnswers
+from .cache import aget_form_list,aget_versioned
+from .filters import InvalidFilter,build_filters
+from .models import Form,FormResponse
+from .schema import get_form_schema
+from .serializers import FormDetailSerializer,FormListSerializer,FormResponseSerializer
+from . import views
+
+
+class AsyncAPIView(View):
+    """
+    Minimal async counterpart of APIView: optional JWT authentication, then
+    the handler's CustomResponse rendered as JSON.
+    """
+    requires_auth = False
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Token authenticated, like the APIViews, which DRF exempts from CSRF
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        if self.requires_auth:
+            try:
+                request.user, _ = await JWTUtils.ais_jwt_authenticated(request)
+            except UnauthorizedAccessException as e:
+                # Same body DRF's exception handler gives the APIViews
+                data = e.detail if isinstance(e.detail, (dict, list)) else {'detail': e.detail}
+                return render_response(Response(data, status=e.status_code))
+        response = await super().dispatch(request, *args, **kwargs)
+        if isinstance(response, Response) and not hasattr(response, 'accepted_renderer'):
+            response = render_response(response)
+        return response
+
+
+class AsyncFormListView(AsyncAPIView):
+    requires_auth = True
+    query_budget = views.FormListView.query_budget
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            user_id = JWTUtils.fetch_user_id(request)
+            forms = await aget_form_list(user_id, lambda: self.build_list(user_id))
+            return CustomResponse(response=PreEncodedJSON(forms)).get_success_response()
+        except Exception as e:
+            return CustomResponse(message=str(e)).get_failure_response()
+
+    @staticmethod
+    async def build_list(user_id):
+        forms = [form async for form in FormListSerializer.trim(Form.objects.filter(user_id=user_id))]
+        return dumps(FormListSerializer(forms, many=True).data)
+
+
+class AsyncFormResponseSubmitAPI(AsyncAPIView):
+    query_budget = views.FormResponseSubmitAPI.query_budget
+
+    async def get(self, request, pk=None):
+        if not pk:
+            return CustomResponse(message="missing formID").get_failure_response()
+        try:
+            schema = await aget_versioned(pk, 'schema', lambda: self.render_schema(pk))
+        except Form.DoesNotExist:
+            return CustomResponse(message="Form does not exits").get_failure_response(status_code=status.HTTP_404_NOT_FOUND)
+        return views.FormResponseSubmitAPI.schema_response(request, schema)
+
+    @staticmethod
+    async def render_schema(pk):
+        form = await FormDetailSerializer.prefetch(Form.objects.all()).aget(pk=pk)
+        return views.FormResponseSubmitAPI.schema_entry(form)
+
+    async def post(self, request, pk=None):
+        # Submissions write, and keep going through the APIView
+        return await sync_to_async(views.FormResponseSubmitAPI.as_view())(request, pk=pk)
+
+
+class AsyncFormResponseDetail(AsyncAPIView):
+    query_budget = views.FormResponseDetail.query_budget
+
+    async def get(self, request):
+        response_id = request.GET.get('responseId')
+        if response_id:
+            try:
+                form_response = await FormResponse.objects.aget(pk=response_id, form__deleted_at__isnull=True)
+            except FormResponse.DoesNotExist:
+                return CustomResponse(message="Response not found").get_failure_response(status_code=status.HTTP_404_NOT_FOUND)
+
+            answers = await ResponseAnswers.aload([form_response])
+            serializer = FormResponseSerializer(form_response, context={'answers': answers})
+            return CustomResponse(response=serializer.data).get_success_response()
+        return CustomResponse(message="missing responseId").get_failure_response()
+
+
+class AsyncFormResponseByForm(AsyncAPIView):
+    query_budget = views.FormResponseByForm.query_budget
+
+    async def get(self, request):
+        form_id = request.GET.get('formId')
+        if not form_id:
+            return CustomResponse(message="Missing formId").get_failure_response(status_code=status.HTTP_400_BAD_REQUEST)
+        if request.GET.get('stream', '').lower() == 'true':
+            # Streaming iterates a sync queryset; leave it to the APIView
+            return await sync_to_async(views.FormResponseByForm.as_view())(request)
+
+        form_responses = FormResponse.objects.filter(form_id=form_id).order_by('pk')
+        try:
+            filters = build_filters(await sync_to_async(get_form_schema)(form_id), request.GET)
+            form_responses = form_responses.filter(*filters)
+        except Form.DoesNotExist:
+            return CustomResponse(message="No responses found for this form").get_failure_response(status_code=status.HTTP_404_NOT_FOUND)
+        except InvalidFilter as e:
+            return CustomResponse(message=str(e)).get_failure_response(status_code=status.HTTP_400_BAD_REQUEST)
+
+        cursor = request.GET.get('cursor')
+        try:
+            page, next_cursor = await akeyset_paginate(form_responses, cursor, get_page_size(request.GET.get('limit')))
+        except InvalidCursor as e:
+            return CustomResponse(message=str(e)).get_failure_response(status_code=status.HTTP_400_BAD_REQUEST)
+        if not page and not cursor and not filters:
+            return CustomResponse(message="No responses found for this form").get_failure_response(status_code=status.HTTP_404_NOT_FOUND)
+
+        answers = await ResponseAnswers.aload(page)
+        serializer = FormResponseSerializer(page, many=True, context={'answers': answers})
+        return CustomResponse(response={'results': serializer.data, 'next': next_cursor}).get_success_response()
@@ -0,0 +1,123 @@
+import uuid
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from .models import Form
+
+# Losing a version only forces a rebuild, so version keys expire like the rest
+FORM_VERSION_TIMEOUT = 60 * 60 * 24 * 7
+FORM_LIST_TIMEOUT = 60 * 60 * 24
+# Version of ids that name no form; never written to the cache
+MISSING_VERSION = 'missing'
+
+
+def form_version_key(form_id):
+    return f'forms:version:{form_id}'
+
+
+def get_form_version(form_id):
+    """
+    Return the current schema version token of a form. Anything cached from
+    the form's fields is stored under this token, so bumping it invalidates
+    every cached copy at once. Ids of forms that do not exist get
+    MISSING_VERSION and leave nothing in the cache.
+    """
+    key = form_version_key(form_id)
+    version = cache.get(key)
+    if version is None:
+        if not Form.objects.filter(pk=form_id).exists():
+            return MISSING_VERSION
+        cache.add(key, uuid.uuid4().hex, FORM_VERSION_TIMEOUT)
+        version = cache.get(key)
+    return version
+
+
+def bump_form_version(form_id):
+    cache.set(form_version_key(form_id), uuid.uuid4().hex, FORM_VERSION_TIMEOUT)
+
+
+def get_versioned(form_id, name, build, timeout=DEFAULT_TIMEOUT):
+    """
+    Return the value cached as `name` for the form's current version, calling
+    `build()` to produce and store it on a miss. Raises Form.DoesNotExist
+    for ids of forms that do not exist.
+    """
+    version = get_form_version(form_id)
+    if version == MISSING_VERSION:
+        raise Form.DoesNotExist
+    key = f'forms:{name}:{form_id}:{version}'
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, timeout)
+    return value
+
+
+async def aget_form_version(form_id):
+    key = form_version_key(form_id)
+    version = await cache.aget(key)
+    if version is None:
+        if not await Form.objects.filter(pk=form_id).aexists():
+            return MISSING_VERSION
+        await cache.aadd(key, uuid.uuid4().hex, FORM_VERSION_TIMEOUT)
+        version = await cache.aget(key)
+    return version
+
+
+async def aget_versioned(form_id, name, build, timeout=DEFAULT_TIMEOUT):
+    """
+    Async counterpart of get_versioned; `build` is a coroutine function.
+    """
+    version = await aget_form_version(form_id)
+    if version == MISSING_VERSION:
+        raise Form.DoesNotExist
+    key = f'forms:{name}:{form_id}:{version}'
+    value = await cache.aget(key)
+    if value is None:
+        value = await build()
+        await cache.aset(key, value, timeout)
+    return value
+
+
+def form_list_keys(user_id):
+    return f'forms:list-version:{user_id}', f'forms:list:{user_id}'
+
+
+def bump_form_list_version(user_id):
+    cache.set(form_list_keys(user_id)[0], uuid.uuid4().hex, FORM_VERSION_TIMEOUT)
+
+
+def get_form_list(user_id, build):
+    """
+    Return a user's encoded form list. The list is stored next to the
+    generation it was built for and both are fetched in one cache read; it
+    is rebuilt with `build()` once bump_form_list_version moves the
+    generation on.
+    """
+    version_key, list_key = form_list_keys(user_id)
+    cached = cache.get_many([version_key, list_key])
+    version, entry = cached.get(version_key), cached.get(list_key)
+    if version is not None and entry is not None and entry[0] == version:
+        return entry[1]
+    if version is None:
+        cache.add(version_key, uuid.uuid4().hex, FORM_VERSION_TIMEOUT)
+        version = cache.get(version_key)
+    value = build()
+    cache.set(list_key, (version, value), FORM_LIST_TIMEOUT)
+    return value
+
+
+async def aget_form_list(user_id, build):
+    """
+    Async counterpart of get_form_list; `build` is a coroutine function.
+    """
+    version_key, list_key = form_list_keys(user_id)
+    cached = await cache.aget_many([version_key, list_key])
+    version, entry = cached.get(version_key), cached.get(list_key)
+    if version is not None and entry is not None and entry[0] == version:
+        return entry[1]
+    if version is None:
+        await cache.aadd(version_key, uuid.uuid4().hex, FORM_VERSION_TIMEOUT)
+        version = await cache.aget(version_key)
+    value = await build()
+    await cache.aset(list_key, (version, value), FORM_LIST_TIMEOUT)
+    return value
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Bumped form versions only reach the other workers through a shared
+    cache; with a per-process one they keep serving stale schemas and lists.
+    """
+    if settings.CACHES['default']['BACKEND'] in PROCESS_LOCAL_CACHES:
+        return [Error(
+            "The default cache is local to each process, so form edits and deletions are not seen by other workers.",
+            hint="Set CACHE_LOCATION to a Redis URL shared by every worker.",
+            id='forms.E001',
+        )]
+    return []
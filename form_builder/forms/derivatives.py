@@ -0,0 +1,138 @@
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# name: (max width, max height, JPEG quality)
+DERIVATIVE_SPECS = {
+    'thumb': (200, 200, 70),
+    'preview': (1024, 1024, 80),
+}
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp')
+DERIVATIVE_PREFIXES = ('payment_proofs/', 'formfiles/', 'upi_qrcode/')
+
+LOCK_TIMEOUT = 60
+LOCK_WAIT = 5
+
+executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='derivatives')
+
+
+def is_image(name):
+    return bool(name) and os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+
+
+def derivative_name(name, kind):
+    return f'{os.path.splitext(name)[0]}.{kind}.jpg'
+
+
+def derivative_url(name, kind):
+    return reverse('form-derivative', kwargs={'kind': kind, 'name': name})
+
+
+def derivative_urls(name):
+    if not is_image(name):
+        return None
+    return {kind: derivative_url(name, kind) for kind in DERIVATIVE_SPECS}
+
+
+def name_from_url(url):
+    if url and url.startswith(settings.MEDIA_URL):
+        return unquote(url[len(settings.MEDIA_URL):])
+    return None
+
+
+def render_derivative(name, kind):
+    width, height, quality = DERIVATIVE_SPECS[kind]
+    target = default_storage.path(derivative_name(name, kind))
+    with Image.open(default_storage.path(name)) as image:
+        image.thumbnail((width, height))
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(target), suffix='.jpg', delete=False) as temp:
+            image.save(temp, 'JPEG', quality=quality, optimize=True)
+    os.replace(temp.name, target)
+
+
+def acquire_render_lock(path):
+    """
+    Take the render lock of a derivative by creating `path` exclusively. The
+    lock file lives next to the derivative in media storage, so it holds for
+    every worker sharing the storage whatever cache they use. A lock older
+    than LOCK_TIMEOUT is left from a crashed render and is taken over.
+    """
+    for _ in range(2):
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) < LOCK_TIMEOUT:
+                    return False
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    return False
+
+
+def ensure_derivative(name, kind):
+    """
+    Return the storage name of a derivative, rendering it first if it does not
+    exist yet. Rendering is guarded by a per-derivative lock file so
+    concurrent viewers wait for one render instead of repeating it. Returns
+    None if the original cannot be rendered.
+    """
+    if kind not in DERIVATIVE_SPECS or not is_image(name) or not name.startswith(DERIVATIVE_PREFIXES):
+        return None
+    target = derivative_name(name, kind)
+    if default_storage.exists(target):
+        return target
+    if not default_storage.exists(name):
+        return None
+
+    lock_path = f'{default_storage.path(target)}.lock'
+    if acquire_render_lock(lock_path):
+        try:
+            if not default_storage.exists(target):
+                render_derivative(name, kind)
+        except Exception:
+            logger.exception("could not render %s derivative of %s", kind, name)
+            return None
+        finally:
+            os.remove(lock_path)
+        return target
+
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        if default_storage.exists(target):
+            return target
+    return None
+
+
+def generate_derivatives(names):
+    for name in names:
+        for kind in DERIVATIVE_SPECS:
+            ensure_derivative(name, kind)
+
+
+def schedule_derivatives(names):
+    """
+    Render every derivative of the given uploads on the background pool.
+    """
+    names = [name for name in names if is_image(name)]
+    if names:
+        executor.submit(generate_derivatives, names)
+
+
+def delete_derivatives(name):
+    for kind in DERIVATIVE_SPECS:
+        default_storage.delete(derivative_name(name, kind))
@@ -0,0 +1,81 @@
+import csv
+from collections import defaultdict
+from .answers import ANSWER_MODELS,FILE_ANSWER_MODELS
+from .models import FormField,FormResponse
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """
+    File-like object whose write() returns the line instead of buffering it,
+    so csv.writer can feed a streaming response.
+    """
+
+    def write(self, value):
+        return value
+
+
+def format_value(values):
+    if not values:
+        return ''
+    return '; '.join('' if value is None else value.isoformat() if hasattr(value, 'isoformat') else str(value) for value in values)
+
+
+def load_answer_lists(response_ids, answer_models):
+    """
+    Collect every answer of the given responses, one query per answer table,
+    as lists keyed by (response_id, formfield_id).
+    """
+    answers = defaultdict(list)
+    for model in answer_models:
+        storage = model._meta.get_field('value').storage if model in FILE_ANSWER_MODELS else None
+        rows = model.objects.filter(response_id__in=response_ids).order_by('pk').values_list('response_id', 'formfield_id', 'value')
+        for response_id, formfield_id, value in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            if storage is not None:
+                value = storage.url(value) if value else None
+            answers[(response_id, formfield_id)].append(value)
+    return answers
+
+
+def iter_export_rows(form_id, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield a header row followed by one row per response of the form, with one
+    column per field in field order. Responses are read in primary-key chunks
+    so memory use does not depend on the number of responses.
+    """
+    fields = list(FormField.objects.filter(form_id=form_id).order_by('order').values_list('id', 'label', 'type'))
+    answer_models = {ANSWER_MODELS[field_type] for _, _, field_type in fields if field_type in ANSWER_MODELS}
+    yield ['Response ID'] + [label or '' for _, label, _ in fields]
+
+    responses = FormResponse.objects.filter(form_id=form_id).order_by('pk')
+    last_pk = None
+    while True:
+        chunk = responses.filter(pk__gt=last_pk) if last_pk is not None else responses
+        response_ids = list(chunk.values_list('pk', flat=True)[:chunk_size])
+        if not response_ids:
+            return
+        answers = load_answer_lists(response_ids, answer_models)
+        for response_id in response_ids:
+            yield [response_id] + [format_value(answers.get((response_id, field_id))) for field_id, _, _ in fields]
+        last_pk = response_ids[-1]
+
+
+def iter_csv(form_id):
+    writer = csv.writer(Echo())
+    for row in iter_export_rows(form_id):
+        yield writer.writerow(row)
+
+
+def write_xlsx(form_id, fileobj):
+    """
+    Write the export as an XLSX workbook to `fileobj`. Requires openpyxl; its
+    write-only mode streams rows to the file instead of holding the sheet.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Responses')
+    for row in iter_export_rows(form_id):
+        sheet.append(row)
+    workbook.save(fileobj)
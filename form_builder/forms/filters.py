@@ -0,0 +1,78 @@
+import re
+from django.db.models import Exists, OuterRef
+from utils.types import FormType
+from .models import ChoiceAnswer,CheckBox,DateTable,ShortAnswer
+from .schema import CHOICE_TYPES,parse_date
+
+FILTER_PARAM = re.compile(r'^filter\[([^\]]+)\](?:\[(\w+)\])?$')
+
+# operator -> lookup on the answer value, per filterable field type
+FILTER_LOOKUPS = {
+    FormType.RADIO_BUTTON: {'eq': 'exact', 'in': 'in'},
+    FormType.DROPDOWN: {'eq': 'exact', 'in': 'in'},
+    FormType.MULTIPLE_CHOICE: {'eq': 'exact', 'in': 'in'},
+    FormType.DATE: {'eq': 'exact', 'gte': 'gte', 'lte': 'lte'},
+    FormType.CHECKBOX: {'eq': 'exact'},
+    FormType.SHORT_ANSWER: {'eq': 'exact', 'prefix': 'startswith'},
+}
+
+FILTER_MODELS = {
+    FormType.RADIO_BUTTON: ChoiceAnswer,
+    FormType.DROPDOWN: ChoiceAnswer,
+    FormType.MULTIPLE_CHOICE: ChoiceAnswer,
+    FormType.DATE: DateTable,
+    FormType.CHECKBOX: CheckBox,
+    FormType.SHORT_ANSWER: ShortAnswer,
+}
+
+
+class InvalidFilter(Exception):
+    pass
+
+
+def coerce_value(schema, field_id, field_type, value):
+    if field_type in CHOICE_TYPES:
+        # Answers store the choice text; accept a choice id or the text itself
+        return schema.choices.get(field_id, {}).get(value, value)
+    if field_type == FormType.DATE:
+        date = parse_date(value)
+        if date is None:
+            raise InvalidFilter(f"Invalid date '{value}' for field '{field_id}'")
+        return date
+    if field_type == FormType.CHECKBOX:
+        if value.lower() not in ('true', 'false'):
+            raise InvalidFilter(f"Expected true or false for field '{field_id}'")
+        return value.lower() == 'true'
+    return value
+
+
+def build_filters(schema, query_params):
+    """
+    Compile `filter[<field_id>]=value` and `filter[<field_id>][<op>]=value`
+    query parameters into EXISTS semi-joins on the answer tables, which the
+    (formfield, value) and (response, formfield) indexes serve directly.
+    """
+    conditions = []
+    for key, value in query_params.items():
+        match = FILTER_PARAM.match(key)
+        if not match:
+            continue
+        field_id, operator = match.group(1), match.group(2) or 'eq'
+        field_type = schema.field_types.get(field_id)
+        if field_type is None:
+            raise InvalidFilter(f"Form field with ID '{field_id}' does not exist.")
+        lookups = FILTER_LOOKUPS.get(field_type, {})
+        if operator not in lookups:
+            raise InvalidFilter(f"Operator '{operator}' is not supported for {field_type} fields")
+
+        if operator == 'in':
+            value = [coerce_value(schema, field_id, field_type, item) for item in value.split(',') if item]
+        else:
+            value = coerce_value(schema, field_id, field_type, value)
+        answers = FILTER_MODELS[field_type].objects.filter(
+            response_id=OuterRef('pk'),
+            formfield_id=field_id,
+            **{f'value__{lookups[operator]}': value},
+        )
+        conditions.append(Exists(answers))
+    return conditions
@@ -0,0 +1,69 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from utils.ids import CompactUUIDField
+
+
+def id_columns():
+    """
+    (table, column, null) of every primary key stored by CompactUUIDField and
+    every foreign key pointing at one.
+    """
+    for model in apps.get_models():
+        for field in model._meta.local_concrete_fields:
+            target = field.target_field if field.is_relation else field
+            if isinstance(target, CompactUUIDField):
+                yield model._meta.db_table, field.column, field.null
+
+
+def conversion_sql(cursor, columns):
+    quote = connection.ops.quote_name
+    columns = list(columns)
+    converted = {(table, column) for table, column, _ in columns}
+
+    drop, create = [], []
+    for table in sorted({table for table, _, _ in columns}):
+        for name, constraint in connection.introspection.get_constraints(cursor, table).items():
+            if not constraint['foreign_key'] or (table, constraint['columns'][0]) not in converted:
+                continue
+            to_table, to_column = constraint['foreign_key']
+            drop.append(f"ALTER TABLE {quote(table)} DROP FOREIGN KEY {quote(name)}")
+            create.append(
+                f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} FOREIGN KEY ({quote(constraint['columns'][0])}) "
+                f"REFERENCES {quote(to_table)} ({quote(to_column)})"
+            )
+
+    convert = []
+    for table, column, null in columns:
+        nullable = 'NULL' if null else 'NOT NULL'
+        convert += [
+            f"ALTER TABLE {quote(table)} MODIFY {quote(column)} VARBINARY(36) {nullable}",
+            f"UPDATE {quote(table)} SET {quote(column)} = UNHEX(REPLACE({quote(column)}, '-', '')) WHERE {quote(column)} IS NOT NULL",
+            f"ALTER TABLE {quote(table)} MODIFY {quote(column)} BINARY(16) {nullable}",
+        ]
+    return drop + convert + create
+
+
+class Command(BaseCommand):
+    help = (
+        "Convert the 36-character id columns of an existing MySQL database to BINARY(16) in place. "
+        "Prints the SQL unless --execute is given. Run it with the application stopped, then record "
+        "the matching AlterField migrations with migrate --fake."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--execute', action='store_true', help="Run the statements instead of printing them")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'mysql':
+            raise CommandError(f"Only MySQL databases need converting; {connection.vendor} tables are created with compact ids by migrate")
+
+        with connection.cursor() as cursor:
+            statements = conversion_sql(cursor, id_columns())
+            if not options['execute']:
+                for statement in statements:
+                    self.stdout.write(f"{statement};")
+                return
+            for statement in statements:
+                cursor.execute(statement)
+        self.stdout.write(f"Ran {len(statements)} statements")
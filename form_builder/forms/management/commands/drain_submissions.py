@@ -0,0 +1,89 @@
+import json
+import time
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError
+from forms.models import FormResponse
+from forms.queue import DONE, FAILED, submission_queue
+from forms.serializers import FormSubmissionSerializer
+
+# Seconds between prunes of finished submissions while looping
+PRUNE_INTERVAL = 60 * 60
+
+
+class Command(BaseCommand):
+    help = "Write queued submissions to the answer tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--loop', action='store_true', help="Keep draining until interrupted")
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds to sleep when the queue is empty")
+
+    def handle(self, *args, **options):
+        pruned_at = None
+        while True:
+            if pruned_at is None or time.monotonic() - pruned_at >= PRUNE_INTERVAL:
+                pruned = submission_queue.prune()
+                if pruned:
+                    self.stdout.write(f"Pruned {pruned} finished submissions")
+                pruned_at = time.monotonic()
+            drained = self.drain(options['batch_size'])
+            if drained:
+                self.stdout.write(f"Drained {drained} submissions")
+            if not options['loop']:
+                return
+            if not drained:
+                time.sleep(options['interval'])
+
+    def drain(self, batch_size):
+        """
+        Write a claimed batch in one transaction. Each response carries its
+        receipt, so a batch re-claimed after a crash between the write and
+        the status update is recognised instead of written twice.
+        """
+        batch = submission_queue.claim(batch_size)
+        written = dict(FormResponse.objects.filter(receipt__in=[receipt for receipt, _ in batch]).values_list('receipt', 'pk'))
+        outcomes = [(receipt, DONE, str(written[receipt]), None) for receipt, _ in batch if receipt in written]
+        serializers, files = [], []
+        try:
+            for receipt, data in batch:
+                if receipt in written:
+                    continue
+                data = submission_queue.open_files(data)
+                files.extend(value for value in data['form_fields'].values() if hasattr(value, 'close'))
+                try:
+                    serializer = FormSubmissionSerializer(data=data)
+                    if not serializer.is_valid():
+                        outcomes.append((receipt, FAILED, None, json.dumps(serializer.errors)))
+                        continue
+                    serializer.prepare(receipt)
+                    serializers.append(serializer)
+                except Exception as e:
+                    outcomes.append((receipt, FAILED, None, str(e)))
+
+            try:
+                FormSubmissionSerializer.save_many(serializers)
+                outcomes += [(serializer.form_response.receipt, DONE, str(serializer.form_response.pk), None) for serializer in serializers]
+            except Exception:
+                # Write one at a time so a bad submission only fails itself
+                for serializer in serializers:
+                    outcomes.append(self.save_one(serializer))
+        finally:
+            for value in files:
+                value.close()
+        submission_queue.finish(outcomes)
+        return len(batch)
+
+    @staticmethod
+    def save_one(serializer):
+        receipt = serializer.form_response.receipt
+        try:
+            FormSubmissionSerializer.save_many([serializer])
+            return receipt, DONE, str(serializer.form_response.pk), None
+        except IntegrityError:
+            # Another drainer wrote it first
+            response_id = FormResponse.objects.filter(receipt=receipt).values_list('pk', flat=True).first()
+            if response_id is not None:
+                return receipt, DONE, str(response_id), None
+            return receipt, FAILED, None, "Could not write the submission"
+        except Exception as e:
+            return receipt, FAILED, None, str(e)
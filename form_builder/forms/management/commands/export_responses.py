@@ -0,0 +1,37 @@
+import csv
+from django.core.management.base import BaseCommand, CommandError
+from forms.export import iter_export_rows,write_xlsx
+from forms.models import Form
+
+
+class Command(BaseCommand):
+    help = "Export every response of a form as CSV or XLSX, one row per response"
+
+    def add_arguments(self, parser):
+        parser.add_argument('form_id')
+        parser.add_argument('--format', choices=['csv', 'xlsx'], default='csv')
+        parser.add_argument('--output', help="File to write to (CSV defaults to stdout)")
+
+    def handle(self, *args, **options):
+        form_id = options['form_id']
+        if not Form.objects.filter(pk=form_id).exists():
+            raise CommandError(f"Form '{form_id}' does not exist")
+
+        if options['format'] == 'xlsx':
+            if not options['output']:
+                raise CommandError("--output is required for XLSX exports")
+            try:
+                with open(options['output'], 'wb') as fileobj:
+                    write_xlsx(form_id, fileobj)
+            except ImportError:
+                raise CommandError("XLSX export requires openpyxl")
+            return
+
+        fileobj = open(options['output'], 'w', newline='') if options['output'] else self.stdout
+        try:
+            writer = csv.writer(fileobj)
+            for row in iter_export_rows(form_id):
+                writer.writerow(row)
+        finally:
+            if fileobj is not self.stdout:
+                fileobj.close()
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from forms.answers import ResponseAnswers
+from forms.models import FormResponse
+
+
+class Command(BaseCommand):
+    help = "Rebuild FormResponse.answers from the normalized answer tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--form', dest='form_id', help="Only rebuild responses of this form")
+        parser.add_argument('--missing-only', action='store_true', help="Skip responses that already have a snapshot")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        responses = FormResponse.objects.order_by('pk')
+        if options['form_id']:
+            responses = responses.filter(form_id=options['form_id'])
+        if options['missing_only']:
+            responses = responses.filter(answers__isnull=True)
+
+        rebuilt = 0
+        last_pk = None
+        while True:
+            batch = responses.filter(pk__gt=last_pk) if last_pk is not None else responses
+            batch = list(batch.only('id', 'form_id')[:options['batch_size']])
+            if not batch:
+                break
+            answers = ResponseAnswers(batch, use_snapshots=False)
+            for response in batch:
+                response.answers = answers.get_answers(response.pk)
+            with transaction.atomic():
+                FormResponse.objects.bulk_update(batch, ['answers'])
+            rebuilt += len(batch)
+            last_pk = batch[-1].pk
+        self.stdout.write(f"Rebuilt {rebuilt} response snapshots")
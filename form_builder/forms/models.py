@@ -1,16 +1,49 @@
-import uuid
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.utils import timezone
+from utils.ids import CompactUUIDField,new_id
 from utils.types import FormType
 from user.models import User
+from .storage import content_addressed_storage
+
+# Fields are spaced ORDER_STEP apart so a move or insert can take a value
+# between its neighbours without renumbering the rest of the form.
+ORDER_STEP = 1024
+
+class ActiveFormManager(models.Manager):
+    """
+    Hides deleted forms; they stay in the table until forms.tasks.purge_deleted_forms
+    has removed their responses and fields.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
 
 class Form(models.Model):
-    id = models.CharField(primary_key=True, max_length=36, default=uuid.uuid4)
+    id = CompactUUIDField(primary_key=True, default=new_id)
     user = models.ForeignKey(User, related_name='forms', on_delete=models.CASCADE)
     title = models.CharField(max_length=255, default='Untitled-form')
     description = models.TextField(null=True, blank=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    objects = ActiveFormManager()
+    all_objects = models.Manager()
+
+    @staticmethod
+    def soft_delete(form_id, user_id):
+        """
+        Mark the form deleted and queue its purge. Returns False when the
+        user has no such form.
+        """
+        with transaction.atomic():
+            if not Form.objects.filter(pk=form_id, user_id=user_id).update(deleted_at=timezone.now()):
+                return False
+            FormPurge.objects.create(form_id=form_id)
+        return True
 
 class FormField(models.Model):
-    id = models.CharField(primary_key=True, max_length=36, default=uuid.uuid4)
+    id = CompactUUIDField(primary_key=True, default=new_id)
     form = models.ForeignKey(Form, related_name='form_fields', on_delete=models.CASCADE)
     type = models.CharField(max_length=20, choices=FormType.CHOICES, default=FormType.SHORT_ANSWER)
     label = models.TextField(null=True, blank=True)
@@ -22,53 +55,74 @@ class FormField(models.Model):
     
     def save(self, *args, **kwargs):
         
-        if self._state.adding:  # New instance
-            if self.order is None:
-                max_order = FormField.objects.filter(form=self.form).aggregate(max_order=models.Max('order'))['max_order']
-                if max_order is not None:
-                    self.order = max_order + 1
-                else:
-                    self.order = 0
-        else:  # Existing instance
-            current_order = FormField.objects.get(pk=self.pk).order
-            if self.order != current_order:
-                if self.order < current_order:
-                    # Move up: increment order of fields between new and old position
-                    FormField.objects.filter(
-                        form=self.form,
-                        order__gte=self.order,
-                        order__lt=current_order
-                    ).exclude(pk=self.pk).update(order=models.F('order') + 1)
-                else:
-                    # Move down: decrement order of fields between old and new position
-                    FormField.objects.filter(
-                        form=self.form,
-                        order__gt=current_order,
-                        order__lte=self.order
-                    ).exclude(pk=self.pk).update(order=models.F('order') - 1)
-        
+        if self._state.adding and self.order is None:  # New instance goes last
+            max_order = FormField.objects.filter(form=self.form).aggregate(max_order=models.Max('order'))['max_order']
+            self.order = (max_order or 0) + ORDER_STEP
         super().save(*args, **kwargs)
 
-    def delete(self, *args, **kwargs):
-        # Decrement order of all fields that come after the deleted order
-        FormField.objects.filter(
-            form=self.form,
-            order__gt=self.order
-        ).update(order=models.F('order') - 1)
-        super().delete(*args, **kwargs)
+    def move_to(self, position):
+        """
+        Move the field to `position` (0-based) among its siblings by giving it
+        an order between its new neighbours, so only this row is written. The
+        form is rebalanced first if there is no gap left between them.
+        """
+        position = max(position, 0)
+        for _ in range(2):
+            siblings = FormField.objects.filter(form_id=self.form_id).exclude(pk=self.pk).order_by('order').values_list('order', flat=True)
+            neighbours = list(siblings[max(position - 1, 0):position + 1])
+            if position == 0:
+                before, after = None, (neighbours[0] if neighbours else None)
+            elif neighbours:
+                before, after = neighbours[0], (neighbours[1] if len(neighbours) > 1 else None)
+            else:
+                before, after = siblings.last(), None
+            low = before if before is not None else 0
+            high = after if after is not None else low + 2 * ORDER_STEP
+            order = (low + high) // 2
+            if low < order < high:
+                FormField.objects.filter(pk=self.pk).update(order=order)
+                self.order = order
+                return
+            FormField.rebalance(self.form_id)
+        raise ValueError("Could not find a free order slot")
+
+    @staticmethod
+    def reorder(form_id, field_ids):
+        """
+        Apply a complete field order in a single UPDATE, spacing the fields
+        ORDER_STEP apart.
+        """
+        with transaction.atomic():
+            existing = set(FormField.objects.select_for_update().filter(form_id=form_id).values_list('id', flat=True))
+            if len(field_ids) != len(existing) or set(field_ids) != existing:
+                raise ValueError("Field list must contain every field of the form exactly once")
+            FormField.objects.filter(form_id=form_id).update(order=models.Case(
+                *[models.When(pk=field_id, then=models.Value((index + 1) * ORDER_STEP)) for index, field_id in enumerate(field_ids)],
+                output_field=models.PositiveIntegerField(),
+            ))
+
+    @staticmethod
+    def rebalance(form_id):
+        field_ids = list(FormField.objects.filter(form_id=form_id).order_by('order', 'pk').values_list('id', flat=True))
+        FormField.reorder(form_id, field_ids)
 
 
 class FormResponse(models.Model):
-    id = models.CharField(primary_key=True, max_length=36, default=uuid.uuid4)
+    id = CompactUUIDField(primary_key=True, default=new_id)
     form = models.ForeignKey(Form, related_name='responses', on_delete=models.CASCADE)
+    # Read model of every answer keyed by field id, written with the answer rows
+    answers = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    # Submission queue receipt the response was drained from; unique so a
+    # re-claimed submission is never written twice
+    receipt = models.CharField(max_length=32, null=True, blank=True, unique=True)
 
 class Choice(models.Model):
-    id = models.CharField(primary_key=True, max_length=36, default=uuid.uuid4)
+    id = CompactUUIDField(primary_key=True, default=new_id)
     formfield = models.ForeignKey(FormField, related_name='choices', on_delete=models.CASCADE)
     text = models.CharField(max_length=255)
     
 class PaymentRequest(models.Model):
-    id = models.CharField(primary_key=True, max_length=36, default=uuid.uuid4)
+    id = CompactUUIDField(primary_key=True, default=new_id)
     formfield = models.ForeignKey(FormField, related_name='payment_details', on_delete=models.CASCADE)
     upi_id = models.CharField(max_length=100,null=False,blank=True)
     amount = models.IntegerField(default=0)
@@ -78,46 +132,102 @@ class PaymentRequest(models.Model):
         return self.upi_id
 
 class Payment(models.Model):
-    id = models.CharField(primary_key=True, max_length=36, default=uuid.uuid4)
+    id = CompactUUIDField(primary_key=True, default=new_id)
     formfield = models.ForeignKey(FormField, related_name='payments_paid', on_delete=models.SET_NULL,null=True)
     response = models.ForeignKey(FormResponse, related_name='payments_paid', on_delete=models.SET_NULL,null=True)
-    value = models.ImageField(upload_to='payment_proofs/')
+    value = models.ImageField(upload_to='payment_proofs/', storage=content_addressed_storage, db_index=True)
     
     def __str__(self):
         return str(self.id)
 
 class ChoiceAnswer(models.Model):
-    id = models.CharField(primary_key=True, max_length=36, default=uuid.uuid4)
+    id = CompactUUIDField(primary_key=True, default=new_id)
     response = models.ForeignKey(FormResponse, related_name='choice_answers', on_delete=models.CASCADE)
     formfield = models.ForeignKey(FormField, related_name='choice_answers', on_delete=models.CASCADE)
     value = models.CharField(max_length=255)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['formfield', 'value'], name='choiceans_field_value_idx'),
+            models.Index(fields=['response', 'formfield'], name='choiceans_response_field_idx'),
+        ]
+
 class LongAnswer(models.Model):
-    id = models.CharField(primary_key=True, max_length=36, default=uuid.uuid4)
+    id = CompactUUIDField(primary_key=True, default=new_id)
     response = models.ForeignKey(FormResponse, related_name='long_answers', on_delete=models.CASCADE)
     formfield = models.ForeignKey(FormField, related_name='long_answers', on_delete=models.CASCADE)
     value = models.TextField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['response', 'formfield'], name='longans_response_field_idx'),
+        ]
+
 class ShortAnswer(models.Model):
-    id = models.CharField(primary_key=True, max_length=36, default=uuid.uuid4)
+    id = CompactUUIDField(primary_key=True, default=new_id)
     response = models.ForeignKey(FormResponse, related_name='short_answers', on_delete=models.CASCADE)
     formfield = models.ForeignKey(FormField, related_name='short_answers', on_delete=models.CASCADE)
     value = models.CharField(max_length=255)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['formfield', 'value'], name='shortans_field_value_idx'),
+            models.Index(fields=['response', 'formfield'], name='shortans_response_field_idx'),
+        ]
+
 class CheckBox(models.Model):
-    id = models.CharField(primary_key=True, max_length=36, default=uuid.uuid4)
+    id = CompactUUIDField(primary_key=True, default=new_id)
     response = models.ForeignKey(FormResponse, related_name='checkboxes', on_delete=models.CASCADE)
     formfield = models.ForeignKey(FormField, related_name='checkboxes', on_delete=models.CASCADE)
     value = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['formfield', 'value'], name='checkbox_field_value_idx'),
+            models.Index(fields=['response', 'formfield'], name='checkbox_response_field_idx'),
+        ]
+
 class DateTable(models.Model):
-    id = models.CharField(primary_key=True, max_length=36, default=uuid.uuid4)
+    id = CompactUUIDField(primary_key=True, default=new_id)
     response = models.ForeignKey(FormResponse, related_name='dates', on_delete=models.CASCADE)
     formfield = models.ForeignKey(FormField, related_name='dates', on_delete=models.CASCADE)
     value = models.DateField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['formfield', 'value'], name='dateans_field_value_idx'),
+            models.Index(fields=['response', 'formfield'], name='dateans_response_field_idx'),
+        ]
+
 class FileTable(models.Model):
-    id = models.CharField(primary_key=True, max_length=36, default=uuid.uuid4)
+    id = CompactUUIDField(primary_key=True, default=new_id)
     response = models.ForeignKey(FormResponse, related_name='files', on_delete=models.CASCADE)
     formfield = models.ForeignKey(FormField, related_name='files', on_delete=models.CASCADE)
-    value = models.FileField(upload_to='formfiles/')
+    value = models.FileField(upload_to='formfiles/', storage=content_addressed_storage, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['response', 'formfield'], name='fileans_response_field_idx'),
+        ]
+
+
+class StoredBlob(models.Model):
+    id = CompactUUIDField(primary_key=True, default=new_id)
+    name = models.CharField(max_length=255, unique=True)
+    digest = models.CharField(max_length=64, db_index=True)
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    last_referenced_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+
+class FormPurge(models.Model):
+    """
+    Progress of removing a deleted form's rows, kept after the form is gone.
+    """
+    id = CompactUUIDField(primary_key=True, default=new_id)
+    # Not a foreign key: the form row is removed by the purge itself
+    form_id = CompactUUIDField(unique=True)
+    stage = models.CharField(max_length=50, blank=True)
+    rows_deleted = models.JSONField(default=dict)
+    requested_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True, db_index=True)
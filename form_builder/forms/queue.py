@@ -0,0 +1,207 @@
+import json
+import os
+import shutil
+import sqlite3
+import time
+import uuid
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+
+QUEUED = 'queued'
+PROCESSING = 'processing'
+DONE = 'done'
+FAILED = 'failed'
+
+# A submission claimed longer ago than this is assumed to belong to a dead worker
+CLAIM_TIMEOUT = 300
+# Finished submissions stay this long so clients can still read their status
+FINISHED_RETENTION = 7 * 24 * 60 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    id TEXT PRIMARY KEY,
+    form_id TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    response_id TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    claimed_at REAL,
+    processed_at REAL
+);
+CREATE INDEX IF NOT EXISTS submissions_status_created ON submissions (status, created_at);
+CREATE INDEX IF NOT EXISTS submissions_processed ON submissions (processed_at);
+"""
+
+
+class SubmissionQueue:
+    """
+    Durable write-behind queue of validated submissions, kept in a SQLite file
+    next to a spool directory for their uploads. Workers claim batches with
+    claim() and record the outcome with complete() or fail().
+    """
+
+    def __init__(self, path=None):
+        self._path = path
+        self.initialized_path = None
+
+    @property
+    def path(self):
+        return self._path or settings.SUBMISSION_QUEUE_PATH
+
+    @property
+    def spool_dir(self):
+        return os.path.join(os.path.dirname(self.path), 'submission_spool')
+
+    def connect(self):
+        if self.initialized_path != self.path:
+            os.makedirs(self.spool_dir, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        if self.initialized_path != self.path:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            self.initialized_path = self.path
+        connection.execute("PRAGMA synchronous=FULL")
+        return connection
+
+    def enqueue(self, data):
+        """
+        Append a submission and return its receipt id. Uploaded files are
+        copied into the spool so the request can finish before it is drained.
+        """
+        receipt = uuid.uuid4().hex
+        form_fields = {}
+        for field_id, value in data['form_fields'].items():
+            if isinstance(value, UploadedFile):
+                directory = os.path.join(self.spool_dir, receipt)
+                os.makedirs(directory, exist_ok=True)
+                path = os.path.join(directory, f'{field_id}-{os.path.basename(value.name)}')
+                with open(path, 'wb') as spooled:
+                    for chunk in value.chunks():
+                        spooled.write(chunk)
+                value = {'__file__': path, 'name': value.name}
+            form_fields[field_id] = value
+        payload = json.dumps({'form': data['form'], 'form_fields': form_fields})
+
+        connection = self.connect()
+        try:
+            connection.execute(
+                "INSERT INTO submissions (id, form_id, payload, status, created_at) VALUES (?, ?, ?, ?, ?)",
+                (receipt, data['form'], payload, QUEUED, time.time()),
+            )
+        finally:
+            connection.close()
+        return receipt
+
+    def claim(self, limit):
+        """
+        Mark up to `limit` of the oldest waiting submissions as processing and
+        return them as (receipt, data) pairs.
+        """
+        now = time.time()
+        connection = self.connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            rows = connection.execute(
+                "SELECT id, payload FROM submissions WHERE status = ? OR (status = ? AND claimed_at < ?) ORDER BY created_at LIMIT ?",
+                (QUEUED, PROCESSING, now - CLAIM_TIMEOUT, limit),
+            ).fetchall()
+            connection.executemany(
+                "UPDATE submissions SET status = ?, claimed_at = ? WHERE id = ?",
+                [(PROCESSING, now, receipt) for receipt, _ in rows],
+            )
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+        return [(receipt, json.loads(payload)) for receipt, payload in rows]
+
+    @staticmethod
+    def open_files(data):
+        """
+        Replace spooled upload references in a claimed payload with open files.
+        """
+        for field_id, value in data['form_fields'].items():
+            if isinstance(value, dict) and '__file__' in value:
+                data['form_fields'][field_id] = UploadedFile(open(value['__file__'], 'rb'), name=value['name'], size=os.path.getsize(value['__file__']))
+        return data
+
+    def finish(self, outcomes):
+        """
+        Record (receipt, status, response_id, error) outcomes in one
+        transaction and drop the spooled uploads of those submissions.
+        """
+        now = time.time()
+        connection = self.connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany(
+                "UPDATE submissions SET status = ?, response_id = ?, error = ?, processed_at = ? WHERE id = ?",
+                [(status, response_id, error, now, receipt) for receipt, status, response_id, error in outcomes],
+            )
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+        for receipt, _, _, _ in outcomes:
+            shutil.rmtree(os.path.join(self.spool_dir, receipt), ignore_errors=True)
+
+    def complete(self, receipt, response_id):
+        self.finish([(receipt, DONE, response_id, None)])
+
+    def fail(self, receipt, error):
+        self.finish([(receipt, FAILED, None, error)])
+
+    def prune(self, retention=FINISHED_RETENTION):
+        """
+        Delete finished submissions processed more than `retention` seconds
+        ago. Returns the number of rows removed.
+        """
+        connection = self.connect()
+        try:
+            cursor = connection.execute(
+                "DELETE FROM submissions WHERE status IN (?, ?) AND processed_at < ?",
+                (DONE, FAILED, time.time() - retention),
+            )
+            return cursor.rowcount
+        finally:
+            connection.close()
+
+    def status(self, receipt):
+        connection = self.connect()
+        try:
+            row = connection.execute(
+                "SELECT status, response_id, error, created_at, processed_at FROM submissions WHERE id = ?",
+                (receipt,),
+            ).fetchone()
+        finally:
+            connection.close()
+        if row is None:
+            return None
+        return dict(zip(('status', 'responseId', 'error', 'createdAt', 'processedAt'), row))
+
+    def metrics(self, window=60):
+        """
+        Queue depth per status and the number of submissions drained per
+        second over the last `window` seconds.
+        """
+        connection = self.connect()
+        try:
+            counts = dict(connection.execute("SELECT status, COUNT(*) FROM submissions GROUP BY status").fetchall())
+            drained = connection.execute(
+                "SELECT COUNT(*) FROM submissions WHERE processed_at >= ?", (time.time() - window,)
+            ).fetchone()[0]
+            oldest = connection.execute(
+                "SELECT MIN(created_at) FROM submissions WHERE status = ?", (QUEUED,)
+            ).fetchone()[0]
+        finally:
+            connection.close()
+        return {
+            'depth': counts.get(QUEUED, 0),
+            'processing': counts.get(PROCESSING, 0),
+            'done': counts.get(DONE, 0),
+            'failed': counts.get(FAILED, 0),
+            'drainRate': round(drained / window, 3),
+            'oldestQueuedAge': round(time.time() - oldest, 3) if oldest else 0,
+        }
+
+
+submission_queue = SubmissionQueue()
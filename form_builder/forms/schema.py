@@ -0,0 +1,141 @@
+import re
+from datetime import datetime
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Mapping, NamedTuple
+from django.core.files.uploadedfile import UploadedFile
+from rest_framework import serializers
+from utils.types import FormType
+from .answers import MULTI_VALUED_TYPES
+from .cache import MISSING_VERSION,get_form_version
+from .models import Form,FormField,Choice
+
+CHOICE_TYPES = frozenset([FormType.RADIO_BUTTON, FormType.MULTIPLE_CHOICE, FormType.DROPDOWN])
+
+# Each accepted date layout is recognised by its shape, so a value is parsed once.
+DATE_FORMATS = (
+    (re.compile(r'^\d{1,2}-\d{1,2}-\d{4}$'), '%d-%m-%Y'),
+    (re.compile(r'^\d{1,2}/\d{1,2}/\d{4}$'), '%d/%m/%Y'),
+    (re.compile(r'^\d{4}-\d{1,2}-\d{1,2}$'), '%Y-%m-%d'),
+)
+
+COMPILED_SCHEMA_CACHE_SIZE = 1024
+
+
+def parse_date(value):
+    if isinstance(value, str):
+        for pattern, date_format in DATE_FORMATS:
+            if pattern.match(value):
+                try:
+                    return datetime.strptime(value, date_format).date()
+                except ValueError:
+                    return None
+    return None
+
+
+class FormSchema(NamedTuple):
+    """
+    Immutable, DB-free description of what a form accepts: field types,
+    labels of required fields and the valid choices of each choice field.
+    """
+    form_id: str
+    field_types: Mapping[str, str]
+    required_fields: Mapping[str, str]
+    choices: Mapping[str, Mapping[str, str]]
+
+    @property
+    def multi_valued_fields(self):
+        return {field_id for field_id, field_type in self.field_types.items() if field_type in MULTI_VALUED_TYPES}
+
+    def get_choice_text(self, field_id, choice_id):
+        return self.choices[field_id][choice_id]
+
+    def validate(self, form_fields_response):
+        """
+        Validate a submission against the schema. Returns the submission with
+        dates parsed, raising ValidationError on the first invalid field.
+        """
+        for field_id, label in self.required_fields.items():
+            if field_id not in form_fields_response:
+                raise serializers.ValidationError(f"Required field '{label}' is missing.")
+
+        cleaned = {}
+        for field_id, field_value in form_fields_response.items():
+            if field_id not in self.field_types:
+                raise serializers.ValidationError(f"Form field with ID '{field_id}' does not exist.")
+
+            field_type = self.field_types[field_id]
+
+            if field_type in [FormType.RADIO_BUTTON, FormType.DROPDOWN]:
+                if not isinstance(field_value, str):
+                    raise serializers.ValidationError(f"Invalid value type for choice field with ID '{field_id}'.")
+                if field_value not in self.choices[field_id]:
+                    raise serializers.ValidationError(f"Choice with ID '{field_value}' does not exist for field with ID '{field_id}'.")
+
+            elif field_type == FormType.MULTIPLE_CHOICE:
+                if not isinstance(field_value, (list, str)):
+                    raise serializers.ValidationError(f"Invalid value type for multiple choice field with ID '{field_id}'. Expected a list or string.")
+                for choice_id in (field_value if isinstance(field_value, list) else [field_value]):
+                    if choice_id not in self.choices[field_id]:
+                        raise serializers.ValidationError(f"Choice with ID '{choice_id}' does not exist for field with ID '{field_id}'.")
+
+            elif field_type == FormType.FILE_UPLOAD:
+                if not isinstance(field_value, UploadedFile):
+                    raise serializers.ValidationError(f"Invalid value type for file field with ID '{field_id}'.")
+
+            elif field_type == FormType.DATE:
+                field_value = parse_date(field_value)
+                if field_value is None:
+                    raise serializers.ValidationError(f"Invalid date format for date field with ID '{field_id}'. Expected format is 'DD-MM-YYYY', 'DD/MM/YYYY', or 'YYYY-MM-DD'.")
+
+            elif field_type == FormType.CHECKBOX:
+                if not isinstance(field_value, bool):
+                    raise serializers.ValidationError(f"Invalid value type for checkbox field with ID '{field_id}'. Expected a boolean.")
+
+            elif field_type in [FormType.SHORT_ANSWER, FormType.LONG_ANSWER]:
+                if not isinstance(field_value, str):
+                    raise serializers.ValidationError(f"Invalid value type for short answer field with ID '{field_id}'.")
+
+            elif field_type == FormType.UPI_PAYMENT:
+                if not isinstance(field_value, UploadedFile):
+                    raise serializers.ValidationError(f"Invalid value type for UPI payment field with ID '{field_id}'.")
+
+            cleaned[field_id] = field_value
+        return cleaned
+
+
+def compile_form_schema(form_id):
+    if not Form.objects.filter(pk=form_id).exists():
+        raise Form.DoesNotExist
+    field_types = {}
+    required_fields = {}
+    for field_id, field_type, label, is_required in FormField.objects.filter(form_id=form_id).values_list('id', 'type', 'label', 'is_required'):
+        field_types[field_id] = field_type
+        if is_required:
+            required_fields[field_id] = label
+    choices = {field_id: {} for field_id, field_type in field_types.items() if field_type in CHOICE_TYPES}
+    if choices:
+        for choice_id, field_id, text in Choice.objects.filter(formfield_id__in=choices).values_list('id', 'formfield_id', 'text'):
+            choices[field_id][choice_id] = text
+    return FormSchema(
+        form_id=form_id,
+        field_types=MappingProxyType(field_types),
+        required_fields=MappingProxyType(required_fields),
+        choices=MappingProxyType({field_id: MappingProxyType(texts) for field_id, texts in choices.items()}),
+    )
+
+
+@lru_cache(maxsize=COMPILED_SCHEMA_CACHE_SIZE)
+def _get_compiled_schema(form_id, version):
+    return compile_form_schema(form_id)
+
+
+def get_form_schema(form_id):
+    """
+    Return the compiled schema of a form, compiling it only when the form's
+    version has changed since it was last compiled in this process.
+    """
+    version = get_form_version(form_id)
+    if version == MISSING_VERSION:
+        raise Form.DoesNotExist
+    return _get_compiled_schema(form_id, version)
@@ -1,10 +1,17 @@
+import logging
+from collections import defaultdict
 from rest_framework import serializers
-from datetime import datetime
-from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from django.db.models import Prefetch
 from user.models import User
-from .models import Form,FormField,FormResponse,Choice,ChoiceAnswer,LongAnswer,ShortAnswer,CheckBox,DateTable,FileTable,PaymentRequest,Payment
+from .models import ORDER_STEP,Form,FormField,FormResponse,Choice,ChoiceAnswer,LongAnswer,ShortAnswer,CheckBox,DateTable,FileTable,PaymentRequest,Payment
 from utils.types import FormType
 from utils.utils import sort_nested_list
+from .answers import ANSWER_MODELS,FILE_ANSWER_MODELS,ResponseAnswers,build_snapshot
+from .schema import CHOICE_TYPES,get_form_schema
+from .derivatives import derivative_urls,name_from_url,schedule_derivatives
+
+logger = logging.getLogger(__name__)
 
 class UserRetrievalSerializer(serializers.ModelSerializer):
 
@@ -13,10 +20,17 @@ class UserRetrievalSerializer(serializers.ModelSerializer):
         exclude=['password']
         
 class FormListSerializer(serializers.ModelSerializer):
-    
+
     class Meta:
         model=Form
-        exclude=['user']
+        fields=['id', 'title', 'description']
+
+    @staticmethod
+    def trim(queryset):
+        """
+        Select only the columns the list needs.
+        """
+        return queryset.only('id', 'title', 'description')
 
 class FormCUDSerializer(serializers.ModelSerializer):
     title = serializers.CharField(required=False, default='Untitled-form')
@@ -54,27 +68,31 @@ class FormFieldSerializer(serializers.ModelSerializer):
     qr_code = serializers.ImageField(required=False,write_only=True)
     
     is_required = serializers.BooleanField(required=False, allow_null=True)
+    # 0-based place among the form's fields; `order` itself is a sparse sort key
+    position = serializers.IntegerField(required=False, min_value=0, write_only=True)
 
 
     class Meta:
         model = FormField
         exclude = ['form']
-        read_only_fields = ['id']
+        read_only_fields = ['id', 'order']
     
     def to_representation(self, instance):
         representation = super().to_representation(instance)
         if instance.type in [FormType.RADIO_BUTTON,FormType.MULTIPLE_CHOICE,FormType.DROPDOWN]:
             representation['choices'] = ChoiceSerializer(instance.choices.all(), many=True).data
         if instance.type == FormType.UPI_PAYMENT:
-            payment_details = instance.payment_details.first()
+            payment_details = next(iter(instance.payment_details.all()), None)
             if payment_details:
                 representation['upi_id'] = payment_details.upi_id
                 representation['amount'] = payment_details.amount
-                representation['qr_code'] = payment_details.qr_code.url
+                representation['qr_code'] = payment_details.qr_code.url if payment_details.qr_code else None
+                representation['qr_code_derivatives'] = derivative_urls(payment_details.qr_code.name) if payment_details.qr_code else None
             else:
                 representation['upi_id'] = None
                 representation['amount'] = 0
                 representation['qr_code'] = None
+                representation['qr_code_derivatives'] = None
         return representation
     
 
@@ -84,23 +102,30 @@ class FormFieldSerializer(serializers.ModelSerializer):
         upi_id = validated_data.pop('upi_id',None)
         amount = validated_data.pop('amount',None)
         qr_code = validated_data.pop('qr_code',None)
+        position = validated_data.pop('position', None)
         if 'is_required' not in validated_data:
             validated_data['is_required'] = False
         form_field = FormField.objects.create(form=form, **validated_data)
+        if position is not None:
+            form_field.move_to(position)
         if choices_data and validated_data['type'] in [FormType.RADIO_BUTTON,FormType.MULTIPLE_CHOICE,FormType.DROPDOWN]:
             for choice_data in choices_data:
                 Choice.objects.create(formfield=form_field, text=choice_data)
         if validated_data['type'] == FormType.UPI_PAYMENT and upi_id and amount and qr_code:
-            PaymentRequest.objects.create(formfield=form_field, upi_id=upi_id, amount=amount, qr_code=qr_code)
+            payment_request = PaymentRequest.objects.create(formfield=form_field, upi_id=upi_id, amount=amount, qr_code=qr_code)
+            schedule_derivatives([payment_request.qr_code.name])
 
             
         return form_field
     
     def update(self, instance, validated_data):
         choices_data = validated_data.pop('choices', None)
+        position = validated_data.pop('position', None)
         if not validated_data['is_required']:
             validated_data['is_required'] = instance.is_required
         instance = super().update(instance, validated_data)
+        if position is not None:
+            instance.move_to(position)
         if choices_data and instance.type in [FormType.RADIO_BUTTON,FormType.MULTIPLE_CHOICE,FormType.DROPDOWN]:
             # Optionally handle choices update logic
             instance.choices.all().delete()  # Clear existing choices
@@ -126,9 +151,96 @@ class FormDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model=Form
         exclude=['user']
+
+    @staticmethod
+    def prefetch(queryset):
+        """
+        Load the ordered fields with their choices and payment requests in a
+        fixed number of queries, whatever the number of fields.
+        """
+        return queryset.prefetch_related(
+            Prefetch('form_fields', queryset=FormField.objects.order_by('order').prefetch_related('choices', 'payment_details'))
+        )
     
     
 
+MAX_IMPORT_FIELDS = 500
+
+
+class FormImportFieldSerializer(serializers.Serializer):
+    type = serializers.ChoiceField(choices=FormType.CHOICES)
+    label = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    is_required = serializers.BooleanField(required=False, default=False)
+    choices = serializers.ListField(child=serializers.CharField(max_length=255), required=False, default=list)
+    upi_id = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    amount = serializers.IntegerField(required=False, default=0)
+
+
+class FormImportSerializer(serializers.Serializer):
+    title = serializers.CharField(max_length=255, required=False, default='Untitled-form')
+    description = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    form_fields = FormImportFieldSerializer(many=True, required=False, default=list)
+
+    def validate_form_fields(self, value):
+        if len(value) > MAX_IMPORT_FIELDS:
+            raise serializers.ValidationError(f"A form can be imported with at most {MAX_IMPORT_FIELDS} fields.")
+        return value
+
+    @staticmethod
+    def definition(form):
+        """
+        The import definition of an existing form, fetched with
+        FormDetailSerializer.prefetch. Payment fields keep their QR code.
+        """
+        form_fields = []
+        for field in form.form_fields.all():
+            payment_details = next(iter(field.payment_details.all()), None)
+            form_fields.append({
+                'type': field.type,
+                'label': field.label,
+                'is_required': field.is_required,
+                'choices': [choice.text for choice in field.choices.all()],
+                'upi_id': payment_details.upi_id if payment_details else '',
+                'amount': payment_details.amount if payment_details else 0,
+                'qr_code': payment_details.qr_code.name if payment_details and payment_details.qr_code else None,
+            })
+        return {'title': form.title, 'description': form.description, 'form_fields': form_fields}
+
+    def create(self, validated_data):
+        """
+        Create the form with all its fields, choices and payment requests in
+        one transaction, one bulk insert per table. Orders are assigned up
+        front, ORDER_STEP apart, instead of by FormField.save.
+        """
+        form = Form(user_id=validated_data['user_id'], title=validated_data['title'], description=validated_data.get('description'))
+        # Stored QR code names by field index, passed to save() when cloning
+        qr_codes = validated_data.get('qr_codes', [])
+        fields, choices, payment_requests = [], [], []
+        for index, field_data in enumerate(validated_data['form_fields']):
+            field = FormField(
+                form=form, type=field_data['type'], label=field_data.get('label'),
+                is_required=field_data['is_required'], order=(index + 1) * ORDER_STEP,
+            )
+            fields.append(field)
+            if field.type in CHOICE_TYPES:
+                choices.extend(Choice(formfield=field, text=text) for text in field_data['choices'])
+            elif field.type == FormType.UPI_PAYMENT and field_data.get('upi_id'):
+                payment_requests.append(PaymentRequest(
+                    formfield=field, upi_id=field_data['upi_id'], amount=field_data['amount'],
+                    qr_code=qr_codes[index] if index < len(qr_codes) else None,
+                ))
+
+        with transaction.atomic():
+            form.save(force_insert=True)
+            FormField.objects.bulk_create(fields)
+            Choice.objects.bulk_create(choices)
+            PaymentRequest.objects.bulk_create(payment_requests)
+        return form
+
+    def to_representation(self, instance):
+        return {'id': instance.id, 'title': instance.title, 'description': instance.description}
+
+
 class FormResponseValueSerializer(serializers.Serializer):
     value = serializers.JSONField(required=True)
 
@@ -154,126 +266,80 @@ class FormSubmissionSerializer(serializers.Serializer):
         """
         Custom validation to ensure that the provided responses are valid.
         """
-        form_id = data.get('form')
-        form_fields_response = data.get('form_fields')
-
         try:
-            form = Form.objects.get(id=form_id)
+            self.schema = get_form_schema(data.get('form'))
         except Form.DoesNotExist:
             raise serializers.ValidationError("Form does not exist.")
+        data['form_fields'] = self.schema.validate(data.get('form_fields'))
+        return data
 
-        form_fields = FormField.objects.filter(form=form)
-        form_field_ids = {str(field.id): field.type for field in form_fields}
-        required_field_ids = {str(field.id): field.label for field in form_fields if field.is_required}
+    def prepare(self, receipt=None):
+        """
+        Build the unsaved FormResponse and its answer rows, storing uploads
+        on the way. `receipt` is the submission queue receipt the response is
+        written for, if any. Only done once per serializer.
+        """
+        if getattr(self, 'form_response', None) is not None:
+            return self.form_response, self.answer_rows
+        form_id = self.validated_data['form']
+        form_fields_response = self.validated_data['form_fields']
+        field_types = self.schema.field_types
 
-        for field_id in form_field_ids:
-            if field_id in required_field_ids and field_id not in form_fields_response:
-                raise serializers.ValidationError(f"Required field '{required_field_ids[field_id]}' is missing.")
+        form_response = FormResponse(form_id=form_id, receipt=receipt)
+        answer_rows = defaultdict(list)
         for field_id, field_value in form_fields_response.items():
-            if field_id not in form_field_ids:
-                raise serializers.ValidationError(f"Form field with ID '{field_id}' does not exist.")
-            
-            field_type = form_field_ids[field_id]
-
-            if field_type in [FormType.RADIO_BUTTON, FormType.DROPDOWN]:
-                if not isinstance(field_value, str):
-                    raise serializers.ValidationError(f"Invalid value type for choice field with ID '{field_id}'.")
-                if not Choice.objects.filter(id=field_value, formfield_id=field_id).exists():
-                    raise serializers.ValidationError(f"Choice with ID '{field_value}' does not exist for field with ID '{field_id}'.")
-
-            elif field_type == FormType.MULTIPLE_CHOICE:
-                if not isinstance(field_value, (list, str)):
-                    raise serializers.ValidationError(f"Invalid value type for multiple choice field with ID '{field_id}'. Expected a list or string.")
-                if isinstance(field_value, list):
-                    for choice_id in field_value:
-                        if not Choice.objects.filter(id=choice_id, formfield_id=field_id).exists():
-                            raise serializers.ValidationError(f"Choice with ID '{choice_id}' does not exist for field with ID '{field_id}'.")
-                else:  # It's a string
-                    if not Choice.objects.filter(id=field_value, formfield_id=field_id).exists():
-                        raise serializers.ValidationError(f"Choice with ID '{field_value}' does not exist for field with ID '{field_id}'.")
-
-            elif field_type == FormType.FILE_UPLOAD:
-                if not isinstance(field_value, UploadedFile):  # Assuming file value is stored as a URL or path
-                    raise serializers.ValidationError(f"Invalid value type for file field with ID '{field_id}'.")
-
-            elif field_type == FormType.DATE:
-                try:
-                    datetime.strptime(field_value, '%d-%m-%Y')  # Try 'dd-mm-yyyy' format
-                except ValueError:
-                    try:
-                        datetime.strptime(field_value, '%d/%m/%Y')  # Try 'dd/mm/yyyy' format
-                    except ValueError:
-                        try:
-                            datetime.strptime(field_value, '%Y-%m-%d')  # Try 'yyyy-mm-dd' format
-                        except ValueError:
-                            raise serializers.ValidationError(f"Invalid date format for date field with ID '{field_id}'. Expected format is 'DD-MM-YYYY', 'DD/MM/YYYY', or 'YYYY-MM-DD'.")
-            
-            elif field_type == FormType.CHECKBOX:
-                if not isinstance(field_value, bool):  # Expecting a boolean value
-                    raise serializers.ValidationError(f"Invalid value type for checkbox field with ID '{field_id}'. Expected a boolean.")
+            field_type = field_types[field_id]
+            model = ANSWER_MODELS.get(field_type)
+            if model is None:
+                continue
+            if field_type in CHOICE_TYPES:
+                values = field_value if isinstance(field_value, list) else [field_value]
+                for choice_id in values:
+                    answer_rows[model].append(model(response=form_response, formfield_id=field_id, value=self.schema.get_choice_text(field_id, choice_id)))
+            else:
+                answer_rows[model].append(model(response=form_response, formfield_id=field_id, value=field_value))
 
-            elif field_type in [FormType.SHORT_ANSWER, FormType.LONG_ANSWER]:
-                if not isinstance(field_value, str):
-                    raise serializers.ValidationError(f"Invalid value type for short answer field with ID '{field_id}'.")
+        for model in FILE_ANSWER_MODELS:
+            for row in answer_rows.get(model, []):
+                model._meta.get_field('value').pre_save(row, True)
+        form_response.answers = build_snapshot((row for rows in answer_rows.values() for row in rows), self.schema.multi_valued_fields)
 
-            elif field_type == FormType.UPI_PAYMENT:
-                if not isinstance(field_value, UploadedFile):  # Assuming UPI payment info is stored as a string
-                    raise serializers.ValidationError(f"Invalid value type for UPI payment field with ID '{field_id}'.")
-        return data
+        self.form_response, self.answer_rows = form_response, answer_rows
+        self.rows_written = {FormResponse.__name__: 1}
+        self.rows_written.update({model.__name__: len(rows) for model, rows in answer_rows.items()})
+        return form_response, answer_rows
 
     def save(self):
         """
-        Save the form responses to the database.
+        Save the form responses to the database in a single transaction, with
+        one bulk insert per answer table. Returns the rows written per table.
         """
-        form_id = self.validated_data['form']
-        form = Form.objects.get(pk=form_id)
-        form_response = FormResponse.objects.create(form=form)
-        form_fields = FormField.objects.filter(form=form)
-        saved_responses = []
-
-        for field_id, field_value in self.validated_data['form_fields'].items():
-            field_type = form_fields.get(id=field_id).type
-
-            if field_type == FormType.RADIO_BUTTON or field_type == FormType.DROPDOWN:
-                choice = Choice.objects.get(pk=field_value)
-                choice_answer = ChoiceAnswer.objects.create(response=form_response, formfield_id=field_id, value=choice.text)
-                saved_responses.append(choice_answer)
-
-            elif field_type == FormType.MULTIPLE_CHOICE:
-                if isinstance(field_value, list):
-                    for choice_id in field_value:
-                        choice = Choice.objects.get(pk=choice_id)
-                        choice_answer = ChoiceAnswer.objects.create(response=form_response, formfield_id=field_id, value=choice.text)
-                        saved_responses.append(choice_answer)
-                else:  # It's a string
-                    choice = Choice.objects.get(pk=field_value)
-                    choice_answer = ChoiceAnswer.objects.create(response=form_response, formfield_id=field_id, value=choice.text)
-                    saved_responses.append(choice_answer)
-
-            elif field_type == FormType.FILE_UPLOAD:
-                file_answer = FileTable.objects.create(response=form_response, formfield_id=field_id, value=field_value)
-                saved_responses.append(file_answer.value.url if file_answer.value else None)
-
-            elif field_type == FormType.DATE:
-                date_answer = DateTable.objects.create(response=form_response, formfield_id=field_id, value=field_value)
-                saved_responses.append(date_answer)
-
-            elif field_type == FormType.CHECKBOX:
-                checkbox_answer = CheckBox.objects.create(response=form_response, formfield_id=field_id, value=field_value)
-                saved_responses.append(checkbox_answer)
-
-            elif field_type == FormType.SHORT_ANSWER:
-                short_answer = ShortAnswer.objects.create(response=form_response, formfield_id=field_id, value=field_value)
-                saved_responses.append(short_answer)
-
-            elif field_type == FormType.LONG_ANSWER:
-                long_answer = LongAnswer.objects.create(response=form_response, formfield_id=field_id, value=field_value)
-                saved_responses.append(long_answer)
-
-            elif field_type == FormType.UPI_PAYMENT:
-                payment = Payment.objects.create(response=form_response, formfield_id=field_id, value=field_value)
-                saved_responses.append(payment.value.url if payment.value else None)
-        return saved_responses
+        self.prepare()
+        FormSubmissionSerializer.save_many([self])
+        return self.rows_written
+
+    @staticmethod
+    def save_many(serializers):
+        """
+        Write the prepared submissions of several validated serializers in one
+        transaction, with one bulk insert per table for the whole batch.
+        """
+        responses = []
+        answer_rows = defaultdict(list)
+        for serializer in serializers:
+            form_response, rows_by_model = serializer.prepare()
+            responses.append(form_response)
+            for model, rows in rows_by_model.items():
+                answer_rows[model].extend(rows)
+
+        with transaction.atomic():
+            FormResponse.objects.bulk_create(responses)
+            for model, rows in answer_rows.items():
+                model.objects.bulk_create(rows)
+
+        schedule_derivatives([row.value.name for model in FILE_ANSWER_MODELS for row in answer_rows.get(model, [])])
+        for serializer in serializers:
+            logger.info("form %s response %s rows written: %s", serializer.form_response.form_id, serializer.form_response.pk, serializer.rows_written)
     
         
         
@@ -299,19 +365,42 @@ class FormSubmissionSerializer(serializers.Serializer):
 #         return response_data
 
 
+class FormResponseListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        """
+        Load the answers of every response in the batch up front so each child
+        serializes from memory, unless the caller passed them in the context.
+        """
+        responses = list(data.all() if hasattr(data, 'all') else data)
+        if 'answers' not in self.context:
+            self.context['answers'] = ResponseAnswers(responses)
+        return super().to_representation(responses)
+
+
 class FormResponseSerializer(serializers.ModelSerializer):
     form_fields = serializers.SerializerMethodField()
 
     class Meta:
         model = FormResponse
-        fields = '__all__'
-    
+        exclude = ['answers', 'receipt']
+        list_serializer_class = FormResponseListSerializer
+
+    def get_answers(self, instance):
+        answers = self.context.get('answers')
+        if answers is None:
+            if getattr(self, '_answers', None) is None or self._answers_for != instance.pk:
+                self._answers = ResponseAnswers([instance])
+                self._answers_for = instance.pk
+            answers = self._answers
+        return answers
+
     def get_form_fields(self, instance):
         """
         Customize the representation of form_fields to be a dictionary.
         """
         form_fields_list = []
-        form_fields = instance.form.form_fields.all()
+        form_fields = self.get_answers(instance).get_form_fields(instance.form_id)
         for field in form_fields:
             field_value = self.get_field_value(instance, field)
             form_fields_list.append((field.type,field_value))
@@ -321,25 +410,7 @@ class FormResponseSerializer(serializers.ModelSerializer):
         """
         Get the value of a form field response for the given instance.
         """
-        if field.type == FormType.SHORT_ANSWER:
-            value = ShortAnswer.objects.filter(response=instance, formfield=field).first()
-        elif field.type == FormType.LONG_ANSWER:
-            value = LongAnswer.objects.filter(response=instance, formfield=field).first()
-        elif field.type in [FormType.DROPDOWN,FormType.MULTIPLE_CHOICE,FormType.RADIO_BUTTON]:
-            value = ChoiceAnswer.objects.filter(response=instance, formfield=field).first()
-        elif field.type == FormType.CHECKBOX:
-            value = CheckBox.objects.filter(response=instance, formfield=field).first()
-        elif field.type == FormType.DATE:
-            value = DateTable.objects.filter(response=instance, formfield=field).first()
-        elif field.type == FormType.FILE_UPLOAD:
-            value = FileTable.objects.filter(response=instance, formfield=field).first()
-            return value.value.url if value and value.value else None
-        elif field.type == FormType.UPI_PAYMENT:
-            value = Payment.objects.filter(response=instance, formfield=field).first()
-            return value.value.url if value and value.value else None
-        else:
-            value = None
-        return value.value if value else None
+        return self.get_answers(instance).get_value(instance.pk, field.pk)
 
     def to_representation(self, instance):
         """
@@ -347,4 +418,18 @@ class FormResponseSerializer(serializers.ModelSerializer):
         """
         response_data = super().to_representation(instance)
         response_data['form_fields'] = self.get_form_fields(instance)
-        return response_data
\ No newline at end of file
+        response_data['derivatives'] = self.get_derivatives(instance)
+        return response_data
+
+    def get_derivatives(self, instance):
+        """
+        Thumbnail and preview URLs of the image uploads in the response, keyed
+        by field id.
+        """
+        derivatives = {}
+        for field in self.get_answers(instance).get_form_fields(instance.form_id):
+            if field.type in [FormType.FILE_UPLOAD, FormType.UPI_PAYMENT]:
+                urls = derivative_urls(name_from_url(self.get_field_value(instance, field)))
+                if urls:
+                    derivatives[field.pk] = urls
+        return derivatives
@@ -0,0 +1,61 @@
+import hashlib
+import os
+import tempfile
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores each upload under the SHA-256 digest of its content, hashing it
+    while it is streamed to disk, so identical uploads share one file. Every
+    stored reference is counted on its StoredBlob row; unreferenced blobs are
+    removed by forms.tasks.sweep_unreferenced_blobs.
+    """
+
+    def _save(self, name, content):
+        from .models import StoredBlob
+
+        prefix = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()[:10]
+        temp_dir = self.path('tmp')
+        os.makedirs(temp_dir, exist_ok=True)
+
+        hasher = hashlib.sha256()
+        size = 0
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        with tempfile.NamedTemporaryFile(dir=temp_dir, delete=False) as temp:
+            for chunk in content.chunks():
+                hasher.update(chunk)
+                temp.write(chunk)
+                size += len(chunk)
+        digest = hasher.hexdigest()
+        stored_name = f'{prefix}/{digest[:2]}/{digest}{extension}' if prefix else f'{digest[:2]}/{digest}{extension}'
+
+        # Count the reference before placing the file: the sweeper only removes
+        # blobs whose last reference is older than its grace period, under a
+        # row lock, so a blob referenced here cannot be swept underneath us.
+        now = timezone.now()
+        updated = StoredBlob.objects.filter(name=stored_name).update(ref_count=F('ref_count') + 1, last_referenced_at=now)
+        if not updated:
+            try:
+                with transaction.atomic():
+                    StoredBlob.objects.create(name=stored_name, digest=digest, size=size, ref_count=1, last_referenced_at=now)
+            except IntegrityError:
+                StoredBlob.objects.filter(name=stored_name).update(ref_count=F('ref_count') + 1, last_referenced_at=now)
+
+        full_path = self.path(stored_name)
+        if os.path.exists(full_path):
+            os.remove(temp.name)
+        else:
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            os.replace(temp.name, full_path)
+            if self.file_permissions_mode is not None:
+                os.chmod(full_path, self.file_permissions_mode)
+        return stored_name
+
+
+content_addressed_storage = ContentAddressedStorage()
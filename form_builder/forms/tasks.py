@@ -0,0 +1,176 @@
+import logging
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Count, F, Window
+from django.db.models.functions import Greatest, Lag
+from django.utils import timezone
+from .answers import ANSWER_MODELS,FILE_ANSWER_MODELS
+from .cache import bump_form_version
+from .models import Choice,Form,FormField,FormPurge,FormResponse,FileTable,Payment,PaymentRequest,StoredBlob
+from .storage import content_addressed_storage
+from .derivatives import delete_derivatives
+
+logger = logging.getLogger(__name__)
+
+# Forms with two neighbouring fields closer than this are respaced.
+MIN_ORDER_GAP = 8
+
+BLOB_SWEEP_CHUNK_SIZE = 500
+# Blobs younger than this may belong to an upload whose row is not committed yet
+BLOB_GRACE_PERIOD = timedelta(hours=1)
+
+PURGE_BATCH_SIZE = 1000
+# Keeps one cron run from overlapping the next
+PURGE_TIME_BUDGET = timedelta(minutes=8)
+
+# (model, lookup of the form id) in the order a deleted form's rows are
+# removed: children before the rows they point at.
+PURGE_STAGES = [(model, 'response__form_id') for model in dict.fromkeys(ANSWER_MODELS.values())] + [
+    (FormResponse, 'form_id'),
+    (Choice, 'formfield__form_id'),
+    (PaymentRequest, 'formfield__form_id'),
+    (FormField, 'form_id'),
+]
+
+
+def rebalance_field_orders():
+    crowded = FormField.objects.filter(form__deleted_at__isnull=True).annotate(
+        previous_order=Window(Lag('order'), partition_by=F('form_id'), order_by=F('order').asc())
+    ).filter(order__lt=F('previous_order') + MIN_ORDER_GAP)
+    form_ids = {form_id for form_id in crowded.values_list('form_id', flat=True)}
+    for form_id in form_ids:
+        FormField.rebalance(form_id)
+        bump_form_version(form_id)
+
+
+def count_blob_references(names):
+    references = {}
+    for model in (FileTable, Payment):
+        for row in model.objects.filter(value__in=names).values('value').annotate(count=Count('id')).order_by():
+            references[row['value']] = references.get(row['value'], 0) + row['count']
+    return references
+
+
+def sweep_unreferenced_blobs(chunk_size=BLOB_SWEEP_CHUNK_SIZE, grace_period=BLOB_GRACE_PERIOD):
+    """
+    Walk the stored blobs in chunks, recount their references from the
+    answer tables and delete the files nobody references any more. Returns
+    the number of blobs removed.
+    """
+    cutoff = timezone.now() - grace_period
+    deleted = 0
+    last_pk = None
+    while True:
+        blobs = StoredBlob.objects.order_by('pk')
+        if last_pk is not None:
+            blobs = blobs.filter(pk__gt=last_pk)
+        blobs = list(blobs[:chunk_size])
+        if not blobs:
+            return deleted
+        last_pk = blobs[-1].pk
+
+        references = count_blob_references([blob.name for blob in blobs])
+        changed = []
+        for blob in blobs:
+            count = references.get(blob.name, 0)
+            if count == 0 and blob.last_referenced_at < cutoff:
+                deleted += delete_blob(blob.pk, cutoff)
+            elif count != blob.ref_count:
+                blob.ref_count = count
+                changed.append(blob)
+        StoredBlob.objects.bulk_update(changed, ['ref_count'])
+
+
+def delete_blob(pk, cutoff):
+    # Storage takes a new reference by updating this row first, so holding the
+    # lock while re-checking makes the file removal safe against re-uploads.
+    with transaction.atomic():
+        blob = StoredBlob.objects.select_for_update().filter(pk=pk, last_referenced_at__lt=cutoff).first()
+        if blob is None or count_blob_references([blob.name]):
+            return 0
+        content_addressed_storage.delete(blob.name)
+        delete_derivatives(blob.name)
+        blob.delete()
+    return 1
+
+
+def purge_deleted_forms(batch_size=PURGE_BATCH_SIZE, time_budget=PURGE_TIME_BUDGET):
+    """
+    Remove the rows of soft-deleted forms table by table, at most
+    `batch_size` rows per transaction, recording progress on their
+    FormPurge. Stops once `time_budget` is spent; the next run picks up
+    where this one stopped. Returns the number of rows removed.
+    """
+    deadline = time.monotonic() + time_budget.total_seconds()
+    deleted = 0
+    for purge in FormPurge.objects.filter(finished_at__isnull=True).order_by('requested_at'):
+        for model, lookup in PURGE_STAGES:
+            while True:
+                if time.monotonic() > deadline:
+                    return deleted
+                count = purge_batch(purge, model, lookup, batch_size)
+                deleted += count
+                if count < batch_size:
+                    break
+
+        with transaction.atomic():
+            Form.all_objects.filter(pk=purge.form_id).delete()
+            purge.stage = 'done'
+            purge.finished_at = timezone.now()
+            purge.save(update_fields=['stage', 'finished_at'])
+        logger.info("form %s purged: %s", purge.form_id, purge.rows_deleted)
+    return deleted
+
+
+def purge_batch(purge, model, lookup, batch_size):
+    rows = list(model.objects.filter(**{lookup: purge.form_id}).order_by().values_list('pk', *file_columns(model))[:batch_size])
+    if not rows:
+        return 0
+    with transaction.atomic():
+        model.objects.filter(pk__in=[row[0] for row in rows]).delete()
+        purge.stage = model.__name__
+        purge.rows_deleted[model.__name__] = purge.rows_deleted.get(model.__name__, 0) + len(rows)
+        purge.save(update_fields=['stage', 'rows_deleted'])
+
+    names = [row[1] for row in rows if len(row) > 1 and row[1]]
+    if model is PaymentRequest:
+        delete_unshared_files(names)
+    elif names:
+        release_blobs(names)
+    return len(rows)
+
+
+def file_columns(model):
+    if model in FILE_ANSWER_MODELS:
+        return ['value']
+    if model is PaymentRequest:
+        return ['qr_code']
+    return []
+
+
+def release_blobs(names):
+    """
+    Drop the references the purged answer rows held on their blobs and
+    delete the blobs nobody references any more.
+    """
+    names_by_count = defaultdict(list)
+    for name, count in Counter(names).items():
+        names_by_count[count].append(name)
+    for count, group in names_by_count.items():
+        StoredBlob.objects.filter(name__in=group).update(ref_count=Greatest(F('ref_count') - count, 0))
+
+    # Blobs referenced within the grace period are left to the sweeper
+    cutoff = timezone.now() - BLOB_GRACE_PERIOD
+    for pk in StoredBlob.objects.filter(name__in=set(names), ref_count=0, last_referenced_at__lt=cutoff).values_list('pk', flat=True):
+        delete_blob(pk, cutoff)
+
+
+def delete_unshared_files(names):
+    # Cloned forms share their source's QR code files
+    shared = set(PaymentRequest.objects.filter(qr_code__in=names).values_list('qr_code', flat=True))
+    for name in set(names) - shared:
+        default_storage.delete(name)
+        delete_derivatives(name)
@@ -1,3 +1,664 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db.models import F
+from asgiref.sync import sync_to_async
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.urls import resolve
+from PIL import Image as PILImage
+from user.models import User
+from utils.types import FormType
+from utils.testing import QueryBudgetMixin
+from utils.ids import uuid7
+from utils.utils import generate_jwt
+from .models import Form,FormField,FormPurge,FormResponse,ShortAnswer,CheckBox,ChoiceAnswer,Choice,PaymentRequest,FileTable,StoredBlob
+from .serializers import FormDetailSerializer,FormResponseSerializer,FormSubmissionSerializer
+from .answers import ResponseAnswers
+from .cache import bump_form_version
+from .checks import check_shared_cache
+from .tasks import purge_deleted_forms,rebalance_field_orders,sweep_unreferenced_blobs
+from .analytics import summarize_form
+from .async_views import AsyncFormListView,AsyncFormResponseByForm,AsyncFormResponseDetail,AsyncFormResponseSubmitAPI
+from .derivatives import derivative_name,ensure_derivative
 
 # Create your tests here.
+
+
+class FormResponseTestCase(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='owner', email='owner@example.com')
+        self.form = Form.objects.create(user=self.user, title='Survey')
+
+    def add_responses(self, count):
+        fields = [
+            FormField.objects.create(form=self.form, type=FormType.SHORT_ANSWER, label='Name', is_required=True),
+            FormField.objects.create(form=self.form, type=FormType.CHECKBOX, label='Agree', is_required=False),
+            FormField.objects.create(form=self.form, type=FormType.DROPDOWN, label='Team', is_required=False),
+        ]
+        Choice.objects.create(formfield=fields[2], text='Red')
+        for i in range(count):
+            response = FormResponse.objects.create(form=self.form)
+            ShortAnswer.objects.create(response=response, formfield=fields[0], value=f'name {i}')
+            CheckBox.objects.create(response=response, formfield=fields[1], value=True)
+            ChoiceAnswer.objects.create(response=response, formfield=fields[2], value='Red')
+
+
+class FormResponseSerializerTest(FormResponseTestCase):
+
+    def test_list_serializes_answers_in_field_order(self):
+        self.add_responses(1)
+        data = FormResponseSerializer(FormResponse.objects.filter(form=self.form), many=True).data
+        self.assertEqual(data[0]['form_fields'], [
+            (FormType.SHORT_ANSWER, 'name 0'),
+            (FormType.CHECKBOX, True),
+            (FormType.DROPDOWN, 'Red'),
+        ])
+
+    def test_list_query_count_is_independent_of_response_count(self):
+        self.add_responses(20)
+        # responses, form fields, one query per answer table in use
+        with self.assertNumQueries(5):
+            FormResponseSerializer(FormResponse.objects.filter(form=self.form), many=True).data
+
+
+class FormResponseByFormTest(FormResponseTestCase):
+
+    def test_cursor_pagination_walks_every_response_once(self):
+        self.add_responses(5)
+        seen = []
+        cursor = None
+        while True:
+            params = {'formId': self.form.id, 'limit': 2}
+            if cursor:
+                params['cursor'] = cursor
+            body = self.client.get('/api/forms/responses/', params).json()['response']
+            seen.extend(item['id'] for item in body['results'])
+            cursor = body['next']
+            if cursor is None:
+                break
+        self.assertEqual(sorted(seen), sorted(FormResponse.objects.values_list('id', flat=True)))
+
+    def test_stream_returns_json_array(self):
+        self.add_responses(3)
+        response = self.client.get('/api/forms/responses/', {'formId': self.form.id, 'stream': 'true'})
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(data), 3)
+
+    def test_filters_narrow_listing_by_answer_value(self):
+        self.add_responses(4)
+        name, agree, team = FormField.objects.filter(form=self.form)
+        blue = Choice.objects.create(formfield=team, text='Blue')
+        ChoiceAnswer.objects.filter(response__short_answers__value='name 1').update(value='Blue')
+        CheckBox.objects.filter(response__short_answers__value__in=['name 2', 'name 3']).update(value=False)
+
+        def names(params):
+            body = self.client.get('/api/forms/responses/', {'formId': self.form.id, **params}).json()['response']
+            return sorted(ShortAnswer.objects.filter(response_id__in=[item['id'] for item in body['results']]).values_list('value', flat=True))
+
+        self.assertEqual(names({f'filter[{team.id}]': blue.id}), ['name 1'])
+        self.assertEqual(names({f'filter[{team.id}][in]': 'Red,Blue'}), ['name 0', 'name 1', 'name 2', 'name 3'])
+        self.assertEqual(names({f'filter[{agree.id}]': 'false', f'filter[{name.id}][prefix]': 'name 3'}), ['name 3'])
+        response = self.client.get('/api/forms/responses/', {'formId': self.form.id, f'filter[{agree.id}][prefix]': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+
+class FormSubmissionTest(FormResponseTestCase):
+
+    def test_submission_writes_answers_in_one_bulk_insert_per_table(self):
+        name = FormField.objects.create(form=self.form, type=FormType.SHORT_ANSWER, label='Name', is_required=True)
+        colours = FormField.objects.create(form=self.form, type=FormType.MULTIPLE_CHOICE, label='Colours', is_required=False)
+        red = Choice.objects.create(formfield=colours, text='Red')
+        blue = Choice.objects.create(formfield=colours, text='Blue')
+        serializer = FormSubmissionSerializer(data={
+            'form': str(self.form.id),
+            'form_fields': {str(name.id): 'Ada', str(colours.id): [str(red.id), str(blue.id)]},
+        })
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(serializer.save(), {'FormResponse': 1, 'ShortAnswer': 1, 'ChoiceAnswer': 2})
+        self.assertEqual(sorted(ChoiceAnswer.objects.values_list('value', flat=True)), ['Blue', 'Red'])
+
+    def test_cached_schema_validates_without_queries_until_version_bump(self):
+        team = FormField.objects.create(form=self.form, type=FormType.DROPDOWN, label='Team', is_required=True)
+        red = Choice.objects.create(formfield=team, text='Red')
+        data = {'form': str(self.form.id), 'form_fields': {str(team.id): str(red.id)}}
+        self.assertTrue(FormSubmissionSerializer(data=data).is_valid())
+        with self.assertNumQueries(0):
+            self.assertTrue(FormSubmissionSerializer(data=data).is_valid())
+
+        blue = Choice.objects.create(formfield=team, text='Blue')
+        data['form_fields'][str(team.id)] = str(blue.id)
+        self.assertFalse(FormSubmissionSerializer(data=data).is_valid())
+        bump_form_version(self.form.id)
+        self.assertTrue(FormSubmissionSerializer(data=data).is_valid())
+
+
+class SharedCacheCheckTest(TestCase):
+
+    def test_process_local_cache_fails_the_deploy_check(self):
+        self.assertEqual([error.id for error in check_shared_cache(None)], ['forms.E001'])
+        redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache:6379/1'}}
+        with override_settings(CACHES=redis):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class UnknownFormCacheTest(FormResponseTestCase):
+
+    def test_unknown_form_ids_leave_nothing_in_the_cache(self):
+        from django.core.cache import cache
+        from .schema import _get_compiled_schema
+        unknown = str(uuid7())
+        _get_compiled_schema.cache_clear()
+        cache.clear()
+        self.assertEqual(self.client.get(f'/api/forms/view/{unknown}/').json()['statusCode'], 404)
+        self.assertEqual(self.client.get('/api/forms/responses/', {'formId': unknown}).json()['statusCode'], 404)
+        serializer = FormSubmissionSerializer(data={'form': unknown, 'form_fields': {}})
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(cache._cache, {})
+        self.assertEqual(_get_compiled_schema.cache_info().currsize, 0)
+
+        self.client.get(f'/api/forms/view/{self.form.id}/')
+        self.assertTrue(cache._cache)
+
+
+class PublicFormSchemaTest(FormResponseTestCase):
+
+    def test_schema_is_served_from_cache_and_honours_etag(self):
+        FormField.objects.create(form=self.form, type=FormType.SHORT_ANSWER, label='Name', is_required=True)
+        url = f'/api/forms/view/{self.form.id}/'
+        first = self.client.get(url)
+        self.assertEqual(first.json()['form_fields'][0]['label'], 'Name')
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+        bump_form_version(self.form.id)
+        FormField.objects.create(form=self.form, type=FormType.DATE, label='Birthday', is_required=False)
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+
+
+class FormDetailSerializerTest(FormResponseTestCase):
+
+    def add_fields(self, count):
+        for i in range(count):
+            field = FormField.objects.create(form=self.form, type=FormType.RADIO_BUTTON, label=f'Question {i}', is_required=False)
+            Choice.objects.create(formfield=field, text='Yes')
+            Choice.objects.create(formfield=field, text='No')
+            payment = FormField.objects.create(form=self.form, type=FormType.UPI_PAYMENT, label=f'Fee {i}', is_required=False)
+            PaymentRequest.objects.create(formfield=payment, upi_id='owner@upi', amount=100)
+
+    def assert_detail_queries(self, count):
+        # form, fields, choices, payment requests
+        with self.assertNumQueries(4):
+            form = FormDetailSerializer.prefetch(Form.objects.all()).get(pk=self.form.pk)
+            data = FormDetailSerializer(form).data
+        self.assertEqual(len(data['form_fields']), count)
+
+    def test_query_count_is_fixed_as_fields_grow(self):
+        self.add_fields(2)
+        self.assert_detail_queries(4)
+        self.add_fields(10)
+        self.assert_detail_queries(24)
+
+
+class FormFieldOrderTest(FormResponseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.fields = [
+            FormField.objects.create(form=self.form, type=FormType.SHORT_ANSWER, label=str(i), is_required=False)
+            for i in range(4)
+        ]
+
+    def labels(self):
+        return list(FormField.objects.filter(form=self.form).values_list('label', flat=True))
+
+    def test_move_writes_only_the_moved_row(self):
+        with self.assertNumQueries(2):
+            self.fields[3].move_to(1)
+        self.assertEqual(self.labels(), ['0', '3', '1', '2'])
+        self.fields[0].move_to(10)
+        self.assertEqual(self.labels(), ['3', '1', '2', '0'])
+
+    def test_edit_moves_by_position_and_ignores_order(self):
+        access_token, _ = generate_jwt(User.objects.get(pk=self.user.pk))
+        field = self.fields[0]
+        path = f'/api/forms/{self.form.id}/edit_field/{field.id}/'
+        data = {'label': '0', 'is_required': True, 'order': field.order}
+        self.client.put(path, data, content_type='application/json', headers={'Authorization': f'Bearer {access_token}'})
+        self.assertEqual(self.labels(), ['0', '1', '2', '3'])
+        data['position'] = 2
+        self.client.put(path, data, content_type='application/json', headers={'Authorization': f'Bearer {access_token}'})
+        self.assertEqual(self.labels(), ['1', '2', '0', '3'])
+
+    def test_move_rebalances_when_no_gap_is_left(self):
+        for _ in range(15):
+            FormField.objects.get(label='3').move_to(1)
+            FormField.objects.get(label='2').move_to(1)
+        self.assertEqual(self.labels()[0], '0')
+        self.assertEqual(len(set(FormField.objects.values_list('order', flat=True))), 4)
+
+    def test_delete_leaves_other_orders_untouched(self):
+        orders = [field.order for field in self.fields]
+        self.fields[1].delete()
+        self.assertEqual(list(FormField.objects.values_list('order', flat=True)), orders[:1] + orders[2:])
+
+    def test_reorder_applies_full_order(self):
+        FormField.reorder(self.form.id, [str(field.id) for field in reversed(self.fields)])
+        self.assertEqual(self.labels(), ['3', '2', '1', '0'])
+        with self.assertRaises(ValueError):
+            FormField.reorder(self.form.id, [str(self.fields[0].id)])
+
+    def test_rebalance_task_respaces_crowded_forms(self):
+        FormField.objects.filter(pk=self.fields[1].pk).update(order=self.fields[0].order + 1)
+        rebalance_field_orders()
+        self.assertEqual(list(FormField.objects.values_list('order', flat=True)), [1024, 2048, 3072, 4096])
+
+
+class FormResponseExportTest(FormResponseTestCase):
+
+    def test_csv_export_has_one_row_per_response(self):
+        self.add_responses(3)
+        access_token, _ = generate_jwt(User.objects.get(pk=self.user.pk))
+        response = self.client.get(f'/api/forms/{self.form.id}/export/', HTTP_AUTHORIZATION=f'Bearer {access_token}')
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[0], ['Response ID', 'Name', 'Agree', 'Team'])
+        self.assertEqual(sorted(row[1] for row in rows[1:]), ['name 0', 'name 1', 'name 2'])
+        self.assertEqual(rows[1][2:], ['True', 'Red'])
+
+    def test_management_command_writes_csv(self):
+        self.add_responses(2)
+        out = io.StringIO()
+        call_command('export_responses', str(self.form.id), stdout=out)
+        self.assertEqual(len(list(csv.reader(io.StringIO(out.getvalue())))), 3)
+
+
+class FormAnalyticsTest(FormResponseTestCase):
+
+    def test_summary_is_computed_in_fixed_number_of_queries(self):
+        self.add_responses(6)
+        ChoiceAnswer.objects.filter(response__in=FormResponse.objects.all()[:2]).update(value='Blue')
+        # fields, choices, choice respondents, checkboxes, dates (2), short, long, files, payments, responses
+        with self.assertNumQueries(11):
+            summary = summarize_form(self.form.id)
+        self.assertEqual(summary['responses'], 6)
+        name, agree, team = summary['fields']
+        self.assertEqual((name['answered'], name['min_length'], name['max_length']), (6, 6, 6))
+        self.assertEqual((agree['checked'], agree['unchecked']), (6, 0))
+        self.assertEqual(team['choices'], {'Red': 4, 'Blue': 2})
+
+
+class ResponseSnapshotTest(FormResponseTestCase):
+
+    def test_snapshot_matches_answer_tables_and_is_rebuildable(self):
+        self.add_responses(3)
+        from_tables = FormResponseSerializer(FormResponse.objects.all(), many=True).data
+        call_command('rebuild_response_snapshots', stdout=io.StringIO())
+        self.assertFalse(FormResponse.objects.filter(answers__isnull=True).exists())
+        # responses and form fields only
+        with self.assertNumQueries(2):
+            from_snapshots = FormResponseSerializer(FormResponse.objects.all(), many=True).data
+        self.assertEqual(json.loads(json.dumps(from_snapshots)), json.loads(json.dumps(from_tables)))
+
+    def test_submission_writes_snapshot(self):
+        name = FormField.objects.create(form=self.form, type=FormType.SHORT_ANSWER, label='Name', is_required=True)
+        serializer = FormSubmissionSerializer(data={'form': str(self.form.id), 'form_fields': {str(name.id): 'Ada'}})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+        self.assertEqual(FormResponse.objects.get().answers, {str(name.id): 'Ada'})
+
+
+    def test_every_multiple_choice_selection_is_kept(self):
+        colours = FormField.objects.create(form=self.form, type=FormType.MULTIPLE_CHOICE, label='Colours', is_required=True)
+        red, blue = Choice.objects.create(formfield=colours, text='Red'), Choice.objects.create(formfield=colours, text='Blue')
+        serializer = FormSubmissionSerializer(data={'form': str(self.form.id), 'form_fields': {str(colours.id): [str(red.id), str(blue.id)]}})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+        response = FormResponse.objects.get()
+        self.assertEqual(response.answers, {str(colours.id): ['Red', 'Blue']})
+
+        from_snapshot = FormResponseSerializer(response).data['form_fields']
+        call_command('rebuild_response_snapshots', stdout=io.StringIO())
+        self.assertEqual(FormResponse.objects.get().answers, response.answers)
+        from_tables = FormResponseSerializer(FormResponse.objects.get(), context={'answers': ResponseAnswers([response], use_snapshots=False)}).data['form_fields']
+        self.assertEqual(from_snapshot, [(FormType.MULTIPLE_CHOICE, ['Red', 'Blue'])])
+        self.assertEqual(from_tables, from_snapshot)
+
+class SubmissionQueueTest(FormResponseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.queue_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.queue_dir)
+        self.settings_override = override_settings(SUBMISSION_QUEUE_ENABLED=True, SUBMISSION_QUEUE_PATH=os.path.join(self.queue_dir, 'queue.sqlite3'))
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def test_queued_submission_is_drained_into_answer_tables(self):
+        name = FormField.objects.create(form=self.form, type=FormType.SHORT_ANSWER, label='Name', is_required=True)
+        response = self.client.post(f'/api/forms/view/{self.form.id}/', {'form': str(self.form.id), f'form_fields[{name.id}]': 'Ada'})
+        self.assertEqual(response.status_code, 202)
+        receipt = response.json()['response']['receipt']
+        self.assertFalse(FormResponse.objects.exists())
+        self.assertEqual(self.client.get(f'/api/forms/submissions/{receipt}/').json()['response']['status'], 'queued')
+
+        call_command('drain_submissions', stdout=io.StringIO())
+        submission = self.client.get(f'/api/forms/submissions/{receipt}/').json()['response']
+        self.assertEqual(submission['status'], 'done')
+        self.assertEqual(ShortAnswer.objects.get(response_id=submission['responseId']).value, 'Ada')
+
+    def test_drain_writes_a_batch_once_and_prunes_finished_rows(self):
+        from forms.queue import submission_queue
+        name = FormField.objects.create(form=self.form, type=FormType.SHORT_ANSWER, label='Name', is_required=True)
+        receipts = [submission_queue.enqueue({'form': str(self.form.id), 'form_fields': {str(name.id): f'name {i}'}}) for i in range(3)]
+        # A worker that wrote the first submission and died before completing it
+        claimed = FormSubmissionSerializer(data=submission_queue.claim(1)[0][1])
+        self.assertTrue(claimed.is_valid())
+        claimed.prepare(receipts[0])
+        claimed.save()
+        with mock.patch('forms.queue.CLAIM_TIMEOUT', -1):
+            # one receipt lookup, then savepoint, response and answer inserts for the whole batch
+            with self.assertNumQueries(5):
+                call_command('drain_submissions', stdout=io.StringIO())
+
+        self.assertEqual(FormResponse.objects.count(), 3)
+        self.assertEqual(sorted(ShortAnswer.objects.values_list('value', flat=True)), ['name 0', 'name 1', 'name 2'])
+        for receipt in receipts:
+            self.assertEqual(submission_queue.status(receipt)['status'], 'done')
+        self.assertEqual(submission_queue.status(receipts[0])['responseId'], str(FormResponse.objects.get(receipt=receipts[0]).pk))
+
+        self.assertEqual(submission_queue.prune(), 0)
+        self.assertEqual(submission_queue.prune(retention=-1), 3)
+        self.assertIsNone(submission_queue.status(receipts[0]))
+
+    def test_invalid_submission_is_rejected_before_queueing(self):
+        FormField.objects.create(form=self.form, type=FormType.SHORT_ANSWER, label='Name', is_required=True)
+        response = self.client.post(f'/api/forms/view/{self.form.id}/', {'form': str(self.form.id)})
+        self.assertEqual(response.status_code, 400)
+
+
+class UploadTestCase(FormResponseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.field = FormField.objects.create(form=self.form, type=FormType.FILE_UPLOAD, label='ID card', is_required=False)
+
+    def upload(self, content, name='card.pdf'):
+        response = FormResponse.objects.create(form=self.form)
+        return FileTable.objects.create(response=response, formfield=self.field, value=SimpleUploadedFile(name, content))
+
+
+class ContentAddressedStorageTest(UploadTestCase):
+
+    def test_identical_uploads_share_one_blob(self):
+        first = self.upload(b'same bytes')
+        second = self.upload(b'same bytes', name='copy.PDF')
+        other = self.upload(b'other bytes')
+        self.assertEqual(first.value.name, second.value.name)
+        self.assertNotEqual(first.value.name, other.value.name)
+        self.assertEqual(StoredBlob.objects.get(name=first.value.name).ref_count, 2)
+        self.assertEqual(first.value.read(), b'same bytes')
+
+    def test_sweep_removes_only_unreferenced_blobs(self):
+        kept = self.upload(b'kept')
+        dropped = self.upload(b'dropped')
+        dropped_path = dropped.value.path
+        dropped.delete()
+        self.assertEqual(sweep_unreferenced_blobs(), 0)  # still inside the grace period
+        self.assertEqual(sweep_unreferenced_blobs(grace_period=timedelta(0)), 1)
+        self.assertFalse(os.path.exists(dropped_path))
+        self.assertTrue(os.path.exists(kept.value.path))
+        self.assertEqual(list(StoredBlob.objects.values_list('name', 'ref_count')), [(kept.value.name, 1)])
+
+
+class DerivativeTest(UploadTestCase):
+
+    def image(self):
+        content = io.BytesIO()
+        PILImage.new('RGB', (1600, 1200), 'red').save(content, 'PNG')
+        return content.getvalue()
+
+    def test_derivative_is_rendered_once_on_first_request(self):
+        upload = self.upload(self.image(), name='proof.png')
+        data = FormResponseSerializer(FormResponse.objects.get(pk=upload.response_id)).data
+        urls = data['derivatives'][str(self.field.pk)]
+        response = self.client.get(urls['thumb'])
+        self.assertEqual(response.status_code, 200)
+        with PILImage.open(io.BytesIO(b''.join(response.streaming_content))) as thumb:
+            self.assertLessEqual(max(thumb.size), 200)
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, derivative_name(upload.value.name, 'thumb'))))
+
+    def test_render_lock_is_shared_through_storage(self):
+        upload = self.upload(self.image(), name='proof.png')
+        target = os.path.join(self.media_root, derivative_name(upload.value.name, 'thumb'))
+        lock_path = f'{target}.lock'
+        open(lock_path, 'w').close()
+        with mock.patch('forms.derivatives.LOCK_WAIT', 0.1), mock.patch('forms.derivatives.render_derivative') as render:
+            self.assertIsNone(ensure_derivative(upload.value.name, 'thumb'))
+        render.assert_not_called()
+
+        # A lock left by a crashed render is taken over
+        os.utime(lock_path, (0, 0))
+        self.assertEqual(ensure_derivative(upload.value.name, 'thumb'), derivative_name(upload.value.name, 'thumb'))
+        self.assertTrue(os.path.exists(target))
+        self.assertFalse(os.path.exists(lock_path))
+
+    def test_non_images_have_no_derivatives(self):
+        upload = self.upload(b'%PDF-1.4', name='card.pdf')
+        self.assertEqual(FormResponseSerializer(FormResponse.objects.get(pk=upload.response_id)).data['derivatives'], {})
+        self.assertIsNone(ensure_derivative(upload.value.name, 'thumb'))
+
+
+class QueryBudgetTest(QueryBudgetMixin, FormResponseTestCase):
+
+    def test_read_views_stay_within_their_query_budget(self):
+        self.add_responses(25)
+        access_token, _ = generate_jwt(User.objects.get(pk=self.user.pk))
+        response_id = FormResponse.objects.values_list('pk', flat=True).first()
+        self.assertQueryBudget('get', '/api/forms/', HTTP_AUTHORIZATION=f'Bearer {access_token}')
+        self.assertQueryBudget('get', f'/api/forms/{self.form.id}/', HTTP_AUTHORIZATION=f'Bearer {access_token}')
+        self.assertQueryBudget('get', f'/api/forms/view/{self.form.id}/')
+        self.assertQueryBudget('get', '/api/forms/view_response/', {'responseId': response_id})
+        self.assertQueryBudget('get', '/api/forms/responses/', {'formId': self.form.id})
+
+    def test_budget_overrun_fails_with_the_queries(self):
+        self.add_responses(1)
+        view_class = resolve(f'/api/forms/view/{self.form.id}/').func.view_class
+        with mock.patch.object(view_class, 'query_budget', {'GET': 0}):
+            with self.assertRaisesMessage(AssertionError, 'over its budget of 0'), self.assertLogs('form_builder.requests', 'WARNING'):
+                self.assertQueryBudget('get', f'/api/forms/view/{self.form.id}/')
+
+    def test_server_timing_header_reports_queries(self):
+        self.add_responses(1)
+        response = self.client.get('/api/forms/responses/', {'formId': self.form.id})
+        self.assertIn('queries"', response['Server-Timing'])
+        self.assertIn('serialize;dur=', response['Server-Timing'])
+        self.assertIn('total;dur=', response['Server-Timing'])
+
+
+class BenchmarkDataTest(UploadTestCase):
+
+    def test_generator_builds_answers_for_every_field_type(self):
+        from benchmarks.data import generate
+        from benchmarks.load import percentile
+
+        dataset = generate(users=1, forms_per_user=1, responses=3)
+        form_id = dataset.forms[0]
+        self.assertEqual(len(dataset.fields[form_id]), len(FormType.CHOICES))
+        self.assertEqual(FormResponse.objects.filter(form_id=form_id).count(), 3)
+        response = FormResponse.objects.filter(form_id=form_id).first()
+        self.assertEqual(set(response.answers), set(dataset.fields[form_id]))
+        self.assertEqual(percentile([1, 2, 3, 4], 50), 2)
+        self.assertEqual(percentile([1, 2, 3, 4], 99), 4)
+
+
+class AsyncReadViewTest(FormResponseTestCase):
+
+    async def test_async_views_return_what_the_api_views_return(self):
+        await sync_to_async(self.add_responses)(3)
+        user = await User.objects.aget(pk=self.user.pk)
+        access_token, _ = generate_jwt(user)
+        response_id = await FormResponse.objects.values_list('pk', flat=True).afirst()
+        factory = AsyncRequestFactory()
+        cases = [
+            (AsyncFormListView, '/api/forms/', {}, {'Authorization': f'Bearer {access_token}'}, {}),
+            (AsyncFormResponseSubmitAPI, f'/api/forms/view/{self.form.id}/', {}, {}, {'pk': self.form.id}),
+            (AsyncFormResponseDetail, '/api/forms/view_response/', {'responseId': response_id}, {}, {}),
+            (AsyncFormResponseByForm, '/api/forms/responses/', {'formId': self.form.id}, {}, {}),
+        ]
+        for view_class, path, data, headers, kwargs in cases:
+            expected = await sync_to_async(self.client.get)(path, data, headers=headers)
+            response = await view_class.as_view()(factory.get(path, data, headers=headers), **kwargs)
+            self.assertEqual(response.status_code, expected.status_code, path)
+            self.assertEqual(json.loads(response.content), expected.json(), path)
+
+    async def test_async_list_rejects_missing_token(self):
+        response = await AsyncFormListView.as_view()(AsyncRequestFactory().get('/api/forms/'))
+        self.assertEqual(response.status_code, 401)
+
+
+class FormListCacheTest(FormResponseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        access_token, _ = generate_jwt(User.objects.get(pk=self.user.pk))
+        self.headers = {'Authorization': f'Bearer {access_token}'}
+
+    def list_titles(self):
+        return [form['title'] for form in self.client.get('/api/forms/', headers=self.headers).json()['response']]
+
+    def test_repeated_loads_are_served_from_the_cache(self):
+        Form.objects.filter(pk=self.form.pk).update(description='x' * 1000)
+        forms = self.client.get('/api/forms/', headers=self.headers).json()['response']
+        # The list carries the whole description, not a preview
+        self.assertEqual(forms, [{'id': str(self.form.id), 'title': 'Survey', 'description': 'x' * 1000}])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/forms/', headers=self.headers).json()['response'], forms)
+
+    def test_create_update_and_delete_invalidate_the_list(self):
+        self.assertEqual(self.list_titles(), ['Survey'])
+        self.client.post('/api/forms/create/', {'title': 'Feedback'}, headers=self.headers)
+        self.assertEqual(sorted(self.list_titles()), ['Feedback', 'Survey'])
+        self.client.put(f'/api/forms/{self.form.id}/update/', {'title': 'Renamed'}, content_type='application/json', headers=self.headers)
+        self.assertEqual(sorted(self.list_titles()), ['Feedback', 'Renamed'])
+        form_id = Form.objects.get(title='Feedback').id
+        self.client.delete(f'/api/forms/{form_id}/delete/', headers=self.headers)
+        self.assertEqual(self.list_titles(), ['Renamed'])
+
+
+class FormImportTest(QueryBudgetMixin, FormResponseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        access_token, _ = generate_jwt(User.objects.get(pk=self.user.pk))
+        self.headers = {'Authorization': f'Bearer {access_token}'}
+
+    def test_import_builds_the_whole_form_in_one_insert_per_table(self):
+        definition = {
+            'title': 'Template',
+            'description': 'Imported',
+            'form_fields': [
+                {'type': FormType.SHORT_ANSWER, 'label': f'Question {i}', 'is_required': i % 2 == 0} for i in range(50)
+            ] + [
+                {'type': FormType.DROPDOWN, 'label': 'Team', 'choices': ['Red', 'Blue']},
+                {'type': FormType.UPI_PAYMENT, 'label': 'Fee', 'upi_id': 'shop@upi', 'amount': 250},
+            ],
+        }
+        response = self.assertQueryBudget('post', '/api/forms/import/', json.dumps(definition), content_type='application/json', headers=self.headers)
+        form = Form.objects.get(pk=response.json()['response']['id'])
+        fields = list(form.form_fields.order_by('order'))
+        self.assertEqual([field.label for field in fields], [field['label'] for field in definition['form_fields']])
+        self.assertEqual([field.order for field in fields], [(i + 1) * 1024 for i in range(52)])
+        self.assertEqual(list(fields[50].choices.values_list('text', flat=True)), ['Red', 'Blue'])
+        self.assertEqual(fields[51].payment_details.get().amount, 250)
+        self.assertIn('Template', [form['title'] for form in self.client.get('/api/forms/', headers=self.headers).json()['response']])
+
+    def test_invalid_definition_creates_nothing(self):
+        definition = {'title': 'Broken', 'form_fields': [{'type': FormType.SHORT_ANSWER}, {'type': 'slider'}]}
+        response = self.client.post('/api/forms/import/', definition, content_type='application/json', headers=self.headers)
+        self.assertEqual(response.json()['statusCode'], 400)
+        self.assertFalse(Form.objects.filter(title='Broken').exists())
+
+    def test_clone_copies_fields_choices_and_order(self):
+        self.add_responses(1)
+        response = self.assertQueryBudget('post', f'/api/forms/{self.form.id}/clone/', headers=self.headers)
+        clone = Form.objects.get(pk=response.json()['response']['id'])
+        self.assertEqual(clone.title, 'Copy of Survey')
+        self.assertEqual(
+            list(clone.form_fields.values_list('label', 'type')),
+            list(self.form.form_fields.values_list('label', 'type')),
+        )
+        self.assertEqual(list(Choice.objects.filter(formfield__form=clone).values_list('text', flat=True)), ['Red'])
+        self.assertFalse(clone.responses.exists())
+
+        other = User.objects.create(username='other', email='other@example.com')
+        access_token, _ = generate_jwt(other)
+        response = self.client.post(f'/api/forms/{self.form.id}/clone/', headers={'Authorization': f'Bearer {access_token}'})
+        self.assertEqual(response.json()['statusCode'], 404)
+
+    def test_clone_validates_the_title_override(self):
+        upi = FormField.objects.create(form=self.form, type=FormType.UPI_PAYMENT, label='Fee', is_required=False)
+        PaymentRequest.objects.create(formfield=upi, upi_id='shop@upi', amount=10, qr_code='upi_qrcode/code.png')
+        path = f'/api/forms/{self.form.id}/clone/'
+        for title in ('x' * 256, {'nested': 'title'}):
+            response = self.client.post(path, {'title': title}, content_type='application/json', headers=self.headers)
+            self.assertEqual(response.json()['statusCode'], 400)
+        self.assertEqual(Form.objects.count(), 1)
+
+        response = self.client.post(path, {'title': 'Template'}, content_type='application/json', headers=self.headers)
+        clone = Form.objects.get(pk=response.json()['response']['id'])
+        self.assertEqual(clone.title, 'Template')
+        self.assertEqual(PaymentRequest.objects.get(formfield__form=clone).qr_code.name, 'upi_qrcode/code.png')
+
+
+class FormSoftDeleteTest(UploadTestCase):
+
+    def setUp(self):
+        super().setUp()
+        access_token, _ = generate_jwt(User.objects.get(pk=self.user.pk))
+        self.headers = {'Authorization': f'Bearer {access_token}'}
+        self.add_responses(5)
+        self.file_answer = self.upload(b'scan')
+
+    def test_deleted_form_disappears_before_it_is_purged(self):
+        response_id = self.file_answer.response_id
+        self.client.delete(f'/api/forms/{self.form.id}/delete/', headers=self.headers)
+        self.assertEqual(self.client.get('/api/forms/', headers=self.headers).json()['response'], [])
+        self.assertEqual(self.client.get(f'/api/forms/{self.form.id}/', headers=self.headers).json()['statusCode'], 404)
+        self.assertEqual(self.client.get(f'/api/forms/view/{self.form.id}/').json()['statusCode'], 404)
+        self.assertEqual(self.client.get('/api/forms/view_response/', {'responseId': response_id}).json()['statusCode'], 404)
+        self.assertEqual(self.client.get('/api/forms/responses/', {'formId': self.form.id}).json()['statusCode'], 404)
+        self.assertEqual(self.client.delete(f'/api/forms/{self.form.id}/delete/', headers=self.headers).json()['statusCode'], 404)
+        self.assertEqual(FormResponse.objects.filter(form_id=self.form.id).count(), 6)
+
+    def test_purge_removes_rows_in_batches_and_releases_files(self):
+        path = self.file_answer.value.path
+        StoredBlob.objects.update(last_referenced_at=F('last_referenced_at') - timedelta(days=1))
+        self.assertTrue(Form.soft_delete(self.form.id, self.user.id))
+
+        self.assertEqual(purge_deleted_forms(batch_size=2, time_budget=timedelta(0)), 0)
+        self.assertEqual(FormPurge.objects.get().stage, '')
+        self.assertEqual(purge_deleted_forms(batch_size=2), 27)
+
+        purge = FormPurge.objects.get()
+        self.assertIsNotNone(purge.finished_at)
+        self.assertEqual(purge.rows_deleted, {'ShortAnswer': 5, 'ChoiceAnswer': 5, 'CheckBox': 5, 'FileTable': 1, 'FormResponse': 6, 'Choice': 1, 'FormField': 4})
+        self.assertFalse(Form.all_objects.filter(pk=self.form.id).exists())
+        self.assertFalse(FormResponse.objects.exists())
+        self.assertFalse(StoredBlob.objects.exists())
+        self.assertFalse(os.path.exists(path))
@@ -1,16 +1,32 @@
+from django.conf import settings
 from django.urls import path
 from .views import *
 
+# Under ASGI (form_builder/asgi.py) the hot read paths are served by async views
+if settings.ASYNC_READ_VIEWS:
+    from .async_views import AsyncFormListView as FormListView
+    from .async_views import AsyncFormResponseSubmitAPI as FormResponseSubmitAPI
+    from .async_views import AsyncFormResponseDetail as FormResponseDetail
+    from .async_views import AsyncFormResponseByForm as FormResponseByForm
+
 urlpatterns = [
     path('', FormListView.as_view(), name='form-list'),
     path('create/', FormCreateView.as_view(), name='form-create'),
+    path('import/', FormImportView.as_view(), name='form-import'),
     path('view/<str:pk>/',FormResponseSubmitAPI.as_view(),name='form-view'),
     path('view_response/', FormResponseDetail.as_view(), name='view-response'),
     path('responses/', FormResponseByForm.as_view(), name='form-response'),
+    path('submissions/metrics/', SubmissionQueueMetricsView.as_view(), name='submission-metrics'),
+    path('submissions/<str:receipt>/', SubmissionStatusView.as_view(), name='submission-status'),
+    path('derivatives/<str:kind>/<path:name>', FormDerivativeView.as_view(), name='form-derivative'),
     path('<str:pk>/', FormRetrieveView.as_view(), name='form-detail'),
     path('<str:pk>/update/', FormUpdateView.as_view(), name='form-update'),
     path('<str:pk>/delete/', FormDeleteView.as_view(), name='form-delete'),
+    path('<str:pk>/clone/', FormCloneView.as_view(), name='form-clone'),
     path('<str:pk>/add_field/', AddFieldView.as_view(), name='add-field'),
     path('<str:pk>/edit_field/<str:field_pk>/', EditFieldView.as_view(), name='edit-field'),
     path('<str:pk>/delete_field/<str:field_pk>/', DeleteFieldView.as_view(), name='delete-field'),
+    path('<str:pk>/reorder_fields/', ReorderFieldsView.as_view(), name='reorder-fields'),
+    path('<str:pk>/export/', FormResponseExportView.as_view(), name='form-export'),
+    path('<str:pk>/analytics/', FormAnalyticsView.as_view(), name='form-analytics'),
     ]
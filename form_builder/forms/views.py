@@ -1,3 +1,7 @@
+import hashlib
+import json
+import tempfile
+import time
 import decouple
 import jwt
 import pytz
@@ -12,13 +16,27 @@ from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.http import Http404
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import FileResponse,Http404,HttpResponse,StreamingHttpResponse
+from django.utils.cache import get_conditional_response,patch_cache_control
+from django.utils.http import http_date,quote_etag
 from utils.permission import JWTAuth
-from .serializers import UserRetrievalSerializer,FormListSerializer,FormCUDSerializer,FormDetailSerializer,FormFieldSerializer,FormSubmissionSerializer,FormResponseSerializer
+from .serializers import UserRetrievalSerializer,FormListSerializer,FormCUDSerializer,FormDetailSerializer,FormFieldSerializer,FormImportSerializer,FormSubmissionSerializer,FormResponseSerializer
 from user.models import User
 from .models import Form,FormField,FormResponse
+from .cache import bump_form_list_version,bump_form_version,get_form_list,get_versioned
+from .export import iter_csv,write_xlsx
+from .analytics import summarize_form
+from .queue import submission_queue
+from .derivatives import ensure_derivative
+from .filters import InvalidFilter,build_filters
+from .schema import get_form_schema
 from utils.permission import JWTUtils
-from utils.response import CustomResponse
+from utils.renderers import FastJSONRenderer,PreEncodedJSON,dumps
+from utils.response import CustomResponse,stream_json_array
+from utils.pagination import InvalidCursor,get_page_size,keyset_paginate
 
 # Create your views here.
 
@@ -26,24 +44,31 @@ from utils.response import CustomResponse
 
 class FormListView(APIView):
     authentication_classes = [JWTAuth]
+    # the form list, plus the periodic revocation sync
+    query_budget = 2
     
     def get(self, request, *args, **kwargs):
         try:
             user_id = JWTUtils.fetch_user_id(request)
-            queryset = Form.objects.filter(user_id=user_id)
-            serializer = FormListSerializer(queryset, many=True)
-            return CustomResponse(response=serializer.data).get_success_response()
+            forms = get_form_list(user_id, lambda: self.build_list(user_id))
+            return CustomResponse(response=PreEncodedJSON(forms)).get_success_response()
         except Exception as e:
             return CustomResponse(message=str(e)).get_failure_response()
+
+    @staticmethod
+    def build_list(user_id):
+        queryset = FormListSerializer.trim(Form.objects.filter(user_id=user_id))
+        return dumps(FormListSerializer(queryset, many=True).data)
         
 
 class FormRetrieveView(APIView):
     authentication_classes = [JWTAuth]
+    query_budget = 5
     
     def get(self, request, pk, *args, **kwargs):
         try:
             user_id = JWTUtils.fetch_user_id(request)
-            form = Form.objects.get(pk=pk, user_id=user_id)
+            form = FormDetailSerializer.prefetch(Form.objects.all()).get(pk=pk, user_id=user_id)
             serializer = FormDetailSerializer(form)
             return CustomResponse(response=serializer.data).get_success_response()
         except Form.DoesNotExist:
@@ -60,11 +85,53 @@ class FormCreateView(APIView):
         if serializer.is_valid():
             user_id = JWTUtils.fetch_user_id(request)
             serializer.save(user_id=user_id)
+            bump_form_list_version(user_id)
             return CustomResponse(response=serializer.data).get_success_response()
         else:
             return CustomResponse(message=serializer.errors).get_failure_response()
         
         
+class FormImportView(APIView):
+    authentication_classes = [JWTAuth]
+    # one insert per table inside the transaction, plus the revocation sync
+    query_budget = 7
+
+    def post(self, request, *args, **kwargs):
+        serializer = FormImportSerializer(data=request.data)
+        if serializer.is_valid():
+            user_id = JWTUtils.fetch_user_id(request)
+            serializer.save(user_id=user_id)
+            bump_form_list_version(user_id)
+            return CustomResponse(response=serializer.data).get_success_response()
+        else:
+            return CustomResponse(message=serializer.errors).get_failure_response()
+
+
+class FormCloneView(APIView):
+    authentication_classes = [JWTAuth]
+    # four reads of the source form, FormImportView's writes for the copy
+    query_budget = 11
+
+    def post(self, request, pk, *args, **kwargs):
+        user_id = JWTUtils.fetch_user_id(request)
+        try:
+            source = FormDetailSerializer.prefetch(Form.objects.filter(user_id=user_id)).get(pk=pk)
+        except Form.DoesNotExist:
+            return CustomResponse(message="Form not found").get_failure_response(status_code=status.HTTP_404_NOT_FOUND)
+
+        definition = FormImportSerializer.definition(source)
+        title = request.data.get('title')
+        definition['title'] = title if title not in (None, '') else f"Copy of {source.title}"[:255]
+        serializer = FormImportSerializer(data=definition)
+        if serializer.is_valid():
+            # QR codes are not part of an import definition; the copy shares the source's files
+            serializer.save(user_id=user_id, qr_codes=[field['qr_code'] for field in definition['form_fields']])
+            bump_form_list_version(user_id)
+            return CustomResponse(response=serializer.data).get_success_response()
+        else:
+            return CustomResponse(message=serializer.errors).get_failure_response()
+
+
 class FormUpdateView(APIView):
     authentication_classes = [JWTAuth]
     
@@ -75,6 +142,8 @@ class FormUpdateView(APIView):
             serializer = FormCUDSerializer(form, data=request.data, partial=True)
             if serializer.is_valid():
                 serializer.save(user_id=user_id)
+                bump_form_version(form.id)
+                bump_form_list_version(user_id)
                 return CustomResponse(response=serializer.data).get_success_response()
             else:
                 return CustomResponse(message=serializer.errors).get_failure_response()
@@ -90,8 +159,11 @@ class FormDeleteView(APIView):
     def delete(self, request, pk, *args, **kwargs):
         try:
             user_id = JWTUtils.fetch_user_id(request)
-            form = Form.objects.get(pk=pk, user_id=user_id)
-            form.delete()
+            # The form disappears now; forms.tasks.purge_deleted_forms removes its rows
+            if not Form.soft_delete(pk, user_id):
+                raise Form.DoesNotExist
+            bump_form_version(pk)
+            bump_form_list_version(user_id)
             return CustomResponse(message="Form deleted successfully").get_success_response()
         except Form.DoesNotExist:
             return CustomResponse(message="Form not found").get_failure_response(status_code=status.HTTP_404_NOT_FOUND)
@@ -111,6 +183,7 @@ class AddFieldView(APIView):
         serializer = FormFieldSerializer(data=request.data, context={'form': form})
         if serializer.is_valid():
             serializer.save()
+            bump_form_version(form.id)
             return CustomResponse(message="Form field added").get_success_response()
         else:
             return CustomResponse(message=serializer.errors).get_failure_response()
@@ -123,7 +196,7 @@ class EditFieldView(APIView):
         user_id = JWTUtils.fetch_user_id(request)
         
         try:
-            formfield = FormField.objects.select_related('form').get(pk=field_pk)
+            formfield = FormField.objects.select_related('form').get(pk=field_pk, form__deleted_at__isnull=True)
         except FormField.DoesNotExist:
             return CustomResponse(message="Form field does not exist").get_failure_response(status_code=status.HTTP_404_NOT_FOUND)
         
@@ -133,6 +206,7 @@ class EditFieldView(APIView):
         serializer = FormFieldSerializer(formfield, data=request.data)
         if serializer.is_valid():
             serializer.save()
+            bump_form_version(formfield.form_id)
             return CustomResponse(message="Form field edited").get_success_response()
         else:
             return CustomResponse(message=serializer.errors).get_failure_response()
@@ -145,7 +219,7 @@ class DeleteFieldView(APIView):
         user_id = JWTUtils.fetch_user_id(request)
         
         try:
-            formfield = FormField.objects.select_related('form').get(pk=field_pk)
+            formfield = FormField.objects.select_related('form').get(pk=field_pk, form__deleted_at__isnull=True)
         except FormField.DoesNotExist:
             return CustomResponse(message="Form field does not exist").get_failure_response()
         
@@ -153,22 +227,101 @@ class DeleteFieldView(APIView):
             return CustomResponse(message="Form field does not exist").get_failure_response()
         
         formfield.delete()
+        bump_form_version(formfield.form_id)
         return CustomResponse(message="Form field deleted successfully").get_success_response()
     
 
 
+class ReorderFieldsView(APIView):
+    authentication_classes = [JWTAuth]
+    
+    def put(self, request, pk, *args, **kwargs):
+        user_id = JWTUtils.fetch_user_id(request)
+        if not Form.objects.filter(pk=pk, user_id=user_id).exists():
+            return CustomResponse(message="Form not found").get_failure_response(status_code=status.HTTP_404_NOT_FOUND)
+        
+        field_ids = request.data.get('fields')
+        if not isinstance(field_ids, list):
+            return CustomResponse(message="fields must be a list of field IDs").get_failure_response()
+        try:
+            FormField.reorder(pk, field_ids)
+        except ValueError as e:
+            return CustomResponse(message=str(e)).get_failure_response()
+        bump_form_version(pk)
+        return CustomResponse(message="Form fields reordered").get_success_response()
+    
+
+class FormResponseExportView(APIView):
+    authentication_classes = [JWTAuth]
+    
+    def get(self, request, pk, *args, **kwargs):
+        user_id = JWTUtils.fetch_user_id(request)
+        if not Form.objects.filter(pk=pk, user_id=user_id).exists():
+            return CustomResponse(message="Form not found").get_failure_response(status_code=status.HTTP_404_NOT_FOUND)
+
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format == 'csv':
+            response = StreamingHttpResponse(iter_csv(pk), content_type='text/csv')
+            response['Content-Disposition'] = f'attachment; filename="responses-{pk}.csv"'
+            return response
+        if file_format == 'xlsx':
+            try:
+                fileobj = tempfile.TemporaryFile()
+                write_xlsx(pk, fileobj)
+            except ImportError:
+                return CustomResponse(message="XLSX export requires openpyxl").get_failure_response()
+            fileobj.seek(0)
+            return FileResponse(fileobj, as_attachment=True, filename=f'responses-{pk}.xlsx')
+        return CustomResponse(message="file_format must be csv or xlsx").get_failure_response()
+    
+
+class FormAnalyticsView(APIView):
+    authentication_classes = [JWTAuth]
+    
+    def get(self, request, pk, *args, **kwargs):
+        user_id = JWTUtils.fetch_user_id(request)
+        if not Form.objects.filter(pk=pk, user_id=user_id).exists():
+            return CustomResponse(message="Form not found").get_failure_response(status_code=status.HTTP_404_NOT_FOUND)
+        return CustomResponse(response=summarize_form(pk)).get_success_response()
+    
+
 class FormResponseSubmitAPI(APIView):
+    # on a cold cache: the existence check behind a new version, then the form,
+    # its fields, choices and payment requests
+    query_budget = {'GET': 5}
     
     def get(self, request, pk=None):
         if not pk:
             return CustomResponse(message="missing formID").get_failure_response()
         try:
-            form = Form.objects.get(pk=pk)
+            schema = get_versioned(pk, 'schema', lambda: self.render_schema(pk))
         except Form.DoesNotExist:
             return CustomResponse(message="Form does not exits").get_failure_response(status_code=status.HTTP_404_NOT_FOUND)
+        return self.schema_response(request, schema)
 
-        serializer = FormDetailSerializer(form)
-        return Response(serializer.data)
+    @staticmethod
+    def schema_response(request, schema):
+        response = get_conditional_response(request, etag=schema['etag'], last_modified=schema['last_modified'])
+        if response is None:
+            response = HttpResponse(schema['body'], content_type='application/json')
+        response['ETag'] = schema['etag']
+        response['Last-Modified'] = http_date(schema['last_modified'])
+        patch_cache_control(response, public=True, no_cache=True)
+        return response
+
+    @staticmethod
+    def render_schema(pk):
+        form = FormDetailSerializer.prefetch(Form.objects.all()).get(pk=pk)
+        return FormResponseSubmitAPI.schema_entry(form)
+
+    @staticmethod
+    def schema_entry(form):
+        body = FastJSONRenderer().render(FormDetailSerializer(form).data)
+        return {
+            'body': body,
+            'etag': quote_etag(hashlib.sha256(body).hexdigest()[:32]),
+            'last_modified': int(time.time()),
+        }
     
     def post(self,request,pk = None):
         if not pk:
@@ -189,6 +342,9 @@ class FormResponseSubmitAPI(APIView):
     }
         serializer = FormSubmissionSerializer(data=data)
         if serializer.is_valid():
+            if settings.SUBMISSION_QUEUE_ENABLED:
+                receipt = submission_queue.enqueue(data)
+                return CustomResponse(message="form queued", response={'receipt': receipt}).get_accepted_response()
             serializer.save()
             return CustomResponse(response='form submitted').get_success_response()
         else:
@@ -196,12 +352,41 @@ class FormResponseSubmitAPI(APIView):
         
    
         
+class SubmissionStatusView(APIView):
+    def get(self, request, receipt):
+        submission = submission_queue.status(receipt)
+        if submission is None:
+            return CustomResponse(message="Receipt not found").get_failure_response(status_code=status.HTTP_404_NOT_FOUND)
+        return CustomResponse(response=submission).get_success_response()
+
+
+class SubmissionQueueMetricsView(APIView):
+    authentication_classes = [JWTAuth]
+    
+    def get(self, request):
+        return CustomResponse(response=submission_queue.metrics()).get_success_response()
+
+
+class FormDerivativeView(APIView):
+    def get(self, request, kind, name):
+        try:
+            derivative = ensure_derivative(name, kind)
+        except SuspiciousFileOperation:
+            derivative = None
+        if derivative is None:
+            return CustomResponse(message="Image not found").get_failure_response(status_code=status.HTTP_404_NOT_FOUND)
+        response = FileResponse(default_storage.open(derivative, 'rb'), content_type='image/jpeg')
+        patch_cache_control(response, public=True, max_age=86400)
+        return response
+
+
 class FormResponseDetail(APIView):
+    query_budget = 5
     def get(self,request):
         response_id = request.query_params.get('responseId')
         if response_id:
             try:
-                form_response = FormResponse.objects.get(pk=response_id)
+                form_response = FormResponse.objects.get(pk=response_id, form__deleted_at__isnull=True)
             except FormResponse.DoesNotExist:
                 return CustomResponse(message="Response not found").get_failure_response(status_code=status.HTTP_404_NOT_FOUND)
 
@@ -212,14 +397,31 @@ class FormResponseDetail(APIView):
 
 
 class FormResponseByForm(APIView):
+    # includes the existence check behind a new form version on a cold cache
+    query_budget = 9
     def get(self, request):
         form_id = request.query_params.get('formId')
         if form_id:
-            form_responses = FormResponse.objects.filter(form_id=form_id)
-            if not form_responses.exists():
+            form_responses = FormResponse.objects.filter(form_id=form_id).order_by('pk')
+            try:
+                filters = build_filters(get_form_schema(form_id), request.query_params)
+                form_responses = form_responses.filter(*filters)
+            except Form.DoesNotExist:
                 return CustomResponse(message="No responses found for this form").get_failure_response(status_code=status.HTTP_404_NOT_FOUND)
+            except InvalidFilter as e:
+                return CustomResponse(message=str(e)).get_failure_response(status_code=status.HTTP_400_BAD_REQUEST)
+            if request.query_params.get('stream', '').lower() == 'true':
+                return stream_json_array(form_responses, FormResponseSerializer)
 
-            serializer = FormResponseSerializer(form_responses, many=True)
-            return CustomResponse(response=serializer.data).get_success_response()
+            cursor = request.query_params.get('cursor')
+            try:
+                page, next_cursor = keyset_paginate(form_responses, cursor, get_page_size(request.query_params.get('limit')))
+            except InvalidCursor as e:
+                return CustomResponse(message=str(e)).get_failure_response(status_code=status.HTTP_400_BAD_REQUEST)
+            if not page and not cursor and not filters:
+                return CustomResponse(message="No responses found for this form").get_failure_response(status_code=status.HTTP_404_NOT_FOUND)
+
+            serializer = FormResponseSerializer(page, many=True)
+            return CustomResponse(response={'results': serializer.data, 'next': next_cursor}).get_success_response()
         
-        return CustomResponse(message="Missing formId").get_failure_response(status_code=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return CustomResponse(message="Missing formId").get_failure_response(status_code=status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from user.models import Token
+
+
+class Command(BaseCommand):
+    help = "Fill in token_hash on revoked tokens stored before the column existed"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        filled = 0
+        while True:
+            batch = list(Token.objects.filter(token_hash='').order_by('pk').only('id', 'token')[:options['batch_size']])
+            if not batch:
+                break
+            for token in batch:
+                token.token_hash = Token.hash(token.token)
+            with transaction.atomic():
+                Token.objects.bulk_update(batch, ['token_hash'])
+            filled += len(batch)
+        self.stdout.write(f"Filled in {filled} token hashes")
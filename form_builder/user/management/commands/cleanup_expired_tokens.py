@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from user.tasks import TOKEN_CLEANUP_BATCH_SIZE,cleanup_expired_tokens
+
+
+class Command(BaseCommand):
+    help = "Delete expired entries from the revoked-token table in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=TOKEN_CLEANUP_BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help="Only count the expired tokens")
+
+    def handle(self, *args, **options):
+        count, elapsed = cleanup_expired_tokens(options['batch_size'], dry_run=options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(f"{count} expired tokens would be removed (counted in {elapsed:.2f}s)")
+        else:
+            self.stdout.write(f"Removed {count} expired tokens in {elapsed:.2f}s")
@@ -1,8 +1,9 @@
-import uuid
+import hashlib
 from datetime import timedelta
 from django.utils import timezone
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser
+from utils.ids import CompactUUIDField,new_id
 from utils.types import TokenType
 
 
@@ -10,7 +11,7 @@ def default_expiry():
     return timezone.now() + timedelta(days=7)
 
 class User(AbstractBaseUser):
-    id = models.CharField(primary_key=True, max_length=36, default=uuid.uuid4)
+    id = CompactUUIDField(primary_key=True, default=new_id)
     username = models.CharField(max_length=100, unique=True)
     email = models.EmailField(max_length=255, unique=True)
     password = models.CharField(max_length=200, blank=True, null=True)
@@ -28,6 +29,19 @@ class Token(models.Model):
         ]
     user = models.ForeignKey(User,on_delete=models.CASCADE,related_name='user')
     token = models.TextField(null=False)
+    token_hash = models.CharField(max_length=64,db_index=True,editable=False)
     token_type = models.CharField(max_length=20,choices=TOKEN_TYPE_CHOICES,null=False)
-    expiry = models.DateTimeField(default=default_expiry)
+    # Indexed for the expired-token reaper in user.tasks
+    expiry = models.DateTimeField(default=default_expiry, db_index=True)
+    # Revocation caches re-read the rows created since their last sync by this
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    @staticmethod
+    def hash(token):
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def save(self, *args, **kwargs):
+        if not self.token_hash:
+            self.token_hash = Token.hash(self.token)
+        super().save(*args, **kwargs)
     
@@ -1,6 +1,35 @@
+import logging
+import time
+from django.db import transaction
 from django.utils import timezone
 from .models import Token
 
-def cleanup_expired_tokens():
-    expired_tokens = Token.objects.filter(expiry_time__lt=timezone.now())
-    expired_tokens.delete()
\ No newline at end of file
+logger = logging.getLogger(__name__)
+
+TOKEN_CLEANUP_BATCH_SIZE = 1000
+
+
+def cleanup_expired_tokens(batch_size=TOKEN_CLEANUP_BATCH_SIZE, dry_run=False):
+    """
+    Delete revoked tokens that have expired, at most `batch_size` rows per
+    transaction so the table is never locked for long. An expired token is
+    rejected by its signature check, so its revocation entry is no longer
+    needed. Returns the number of rows removed (or that would be, with
+    `dry_run`) and the seconds taken.
+    """
+    start = time.monotonic()
+    now = timezone.now()
+    expired = Token.objects.filter(expiry__lt=now)
+    if dry_run:
+        return expired.count(), time.monotonic() - start
+
+    removed = 0
+    while True:
+        pks = list(expired.order_by('expiry').values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            break
+        with transaction.atomic():
+            removed += Token.objects.filter(pk__in=pks).delete()[0]
+    elapsed = time.monotonic() - start
+    logger.info("removed %s expired tokens in %.2fs", removed, elapsed)
+    return removed, elapsed
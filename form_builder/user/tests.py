@@ -1,3 +1,93 @@
+import io
+from datetime import timedelta
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+from utils.revocation import revocation_cache
+from utils.types import TokenType
+from utils.utils import generate_jwt,get_refresh_expiry,mark_token_expired
+from .models import Token,User
+from .tasks import cleanup_expired_tokens
 
 # Create your tests here.
+
+
+class TokenRevocationTest(TestCase):
+
+    def setUp(self):
+        revocation_cache.reset()
+        User.objects.create(username='owner', email='owner@example.com')
+        self.user = User.objects.get(username='owner')
+        self.access_token, self.refresh_token = generate_jwt(self.user)
+
+    def get_forms(self):
+        return self.client.get('/api/forms/', HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
+
+    def test_unrevoked_token_is_checked_without_queries(self):
+        revocation_cache.is_revoked(self.access_token)
+        with self.assertNumQueries(0):
+            self.assertFalse(revocation_cache.is_revoked(self.access_token))
+
+    def test_revoked_token_is_rejected(self):
+        self.assertEqual(self.get_forms().status_code, 200)
+        mark_token_expired(self.access_token, self.user, TokenType.ACCESS, get_refresh_expiry(self.access_token))
+        self.assertEqual(self.get_forms().status_code, 401)
+
+    def test_revocation_from_another_process_is_picked_up_on_sync(self):
+        self.assertFalse(revocation_cache.is_revoked(self.refresh_token))
+        mark_token_expired(self.refresh_token, self.user, TokenType.REFRESH, get_refresh_expiry(self.refresh_token))
+        revocation_cache.reset()
+        self.assertTrue(revocation_cache.is_revoked(self.refresh_token))
+
+    def test_logout_revokes_both_tokens(self):
+        response = self.client.post('/api/user/logout/', {'refreshToken': self.refresh_token}, HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_forms().status_code, 401)
+        self.assertTrue(revocation_cache.is_revoked(self.refresh_token))
+
+    def test_revocation_committed_late_is_picked_up_by_the_next_sync(self):
+        mark_token_expired(self.access_token, self.user, TokenType.ACCESS, get_refresh_expiry(self.access_token))
+        revocation_cache.is_revoked(self.refresh_token)
+        # A row with a lower id and an earlier creation time, committed after the sync
+        Token.objects.create(
+            id=Token.objects.get().id - 1, user=self.user, token=self.refresh_token, token_type=TokenType.REFRESH,
+            expiry=get_refresh_expiry(self.refresh_token), created_at=timezone.now() - timedelta(seconds=30),
+        )
+        revocation_cache.last_sync = None
+        self.assertTrue(revocation_cache.is_revoked(self.refresh_token))
+
+    def test_tokens_revoked_before_hashing_stay_revoked(self):
+        mark_token_expired(self.access_token, self.user, TokenType.ACCESS, get_refresh_expiry(self.access_token))
+        Token.objects.update(token_hash='')
+        revocation_cache.reset()
+        self.assertTrue(revocation_cache.is_revoked(self.access_token))
+
+        out = io.StringIO()
+        call_command('backfill_token_hashes', stdout=out)
+        self.assertIn('Filled in 1 token hashes', out.getvalue())
+        self.assertEqual(Token.objects.get().token_hash, Token.hash(self.access_token))
+
+class ExpiredTokenCleanupTest(TestCase):
+
+    def setUp(self):
+        user = User.objects.create(username='owner', email='owner@example.com')
+        now = timezone.now()
+        for i in range(5):
+            Token.objects.create(user=user, token=f'expired {i}', token_type=TokenType.ACCESS, expiry=now - timedelta(minutes=i + 1))
+        Token.objects.create(user=user, token='live', token_type=TokenType.REFRESH, expiry=now + timedelta(days=1))
+
+    def test_expired_tokens_are_removed_in_batches(self):
+        self.assertEqual(cleanup_expired_tokens(dry_run=True)[0], 5)
+        self.assertEqual(Token.objects.count(), 6)
+        # per batch of two: a select, then the delete inside a savepoint; plus the last, empty select
+        with self.assertNumQueries(3 * 4 + 1):
+            removed, _ = cleanup_expired_tokens(batch_size=2)
+        self.assertEqual(removed, 5)
+        self.assertEqual(list(Token.objects.values_list('token', flat=True)), ['live'])
+
+    def test_command_reports_rows_removed(self):
+        out = io.StringIO()
+        call_command('cleanup_expired_tokens', '--dry-run', stdout=out)
+        self.assertIn('5 expired tokens would be removed', out.getvalue())
+        call_command('cleanup_expired_tokens', '--batch-size', '3', stdout=out)
+        self.assertIn('Removed 5 expired tokens', out.getvalue())
@@ -14,8 +14,9 @@ from rest_framework.response import Response
 from rest_framework.authentication import get_authorization_header
 
 
-from utils.utils import get_utc_time,generate_jwt,format_time,mark_token_expired,get_refresh_expiry
-from utils.permission import JWTUtils
+from utils.utils import get_utc_time,generate_jwt,format_time,mark_token_expired,get_refresh_expiry,string_to_date_time
+from utils.permission import JWTAuth,JWTUtils
+from utils.revocation import revocation_cache
 from utils.response import CustomResponse
 from utils.types import TokenType
 from .models import User,Token
@@ -58,23 +59,25 @@ class UserAuthAPI(APIView):
             
 
 class UserLogoutAPI(APIView):
+    authentication_classes = [JWTAuth]
+
     def post(self,request):
         
-        user_id = JWTUtils.fetch_user_id(request)
-        if not user_id:
+        principal = JWTUtils.fetch_principal(request)
+        if not principal.user_id:
             return CustomResponse(message="Invalid user").get_failure_response()
-        user = User.objects.filter(id=user_id).first()
+        user = User.objects.filter(id=principal.user_id).first()
         
         if not user:
             return CustomResponse(message="Invalid user").get_failure_response()
 
         refresh_token = request.data.get('refreshToken')
-        access_token = get_authorization_header(request).decode("utf-8")[len("Bearer"):].strip()
+        access_token = principal.token
 
         if not access_token:
             return CustomResponse(message="Access token is required").get_failure_response() 
         
-        access_expiry = JWTUtils.fetch_expiry(request)
+        access_expiry = principal.expiry
 
         if refresh_token:
             refresh_expiry = get_refresh_expiry(refresh_token)
@@ -91,8 +94,7 @@ class GetAcessToken(APIView):
     def post(self,request):
         refresh_token = request.data.get('refreshToken')
         
-        existing_token = Token.objects.filter(token=refresh_token).first()
-        if existing_token:
+        if refresh_token and revocation_cache.is_revoked(refresh_token):
             return CustomResponse(message="Invalid or expired refresh token").get_unauthorized_response()
     
         try:
@@ -102,7 +104,7 @@ class GetAcessToken(APIView):
         
         user_id = payload.get('id')
         token_type = payload.get('tokenType')
-        expiry = datetime.strptime(payload.get("expiry"), "%Y-%m-%d %H:%M:%S%z")
+        expiry = string_to_date_time(payload.get("expiry"))
         
         if token_type != "refresh" or expiry < get_utc_time():
             return CustomResponse(message="Invalid or expired refresh token").get_unauthorized_response()
@@ -0,0 +1,60 @@
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(value):
+    raw = json.dumps({'after': value}, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))['after']
+    except Exception as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+
+def get_page_size(value, default=DEFAULT_PAGE_SIZE):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def keyset_page_query(queryset, cursor=None, limit=DEFAULT_PAGE_SIZE, key='pk'):
+    queryset = queryset.order_by(key)
+    if cursor:
+        queryset = queryset.filter(**{f'{key}__gt': decode_cursor(cursor)})
+    return queryset[:limit + 1]
+
+
+def split_page(rows, limit, key='pk'):
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(getattr(rows[-1], key))
+    return rows, next_cursor
+
+
+def keyset_paginate(queryset, cursor=None, limit=DEFAULT_PAGE_SIZE, key='pk'):
+    """
+    Return one page of `queryset` ordered by the unique column `key`, starting
+    after the row encoded in `cursor`, and the cursor for the next page (None
+    on the last page).
+    """
+    rows = list(keyset_page_query(queryset, cursor, limit, key))
+    return split_page(rows, limit, key)
+
+
+async def akeyset_paginate(queryset, cursor=None, limit=DEFAULT_PAGE_SIZE, key='pk'):
+    rows = [row async for row in keyset_page_query(queryset, cursor, limit, key)]
+    return split_page(rows, limit, key)
@@ -1,6 +1,8 @@
 import datetime
 import decouple
-from datetime import datetime
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import NamedTuple
 
 import jwt
 from django.conf import settings
@@ -11,14 +13,29 @@ from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.permissions import BasePermission
 from form_builder.settings import SECRET_KEY
 from .exception import UnauthorizedAccessException
-from .utils import get_utc_time
-from user.models import Token
+from .utils import get_utc_time,string_to_date_time
+from .revocation import revocation_cache
 
 def format_time(date_time):
     formatted_time = date_time.strftime("%Y-%m-%d %H:%M:%S%z")
     return datetime.strptime(formatted_time, "%Y-%m-%d %H:%M:%S%z")
 
 
+class AuthPrincipal(NamedTuple):
+    """
+    Identity decoded from a request's JWT, built once by JWTAuth and exposed
+    as request.user.
+    """
+    user_id: str
+    expiry: datetime
+    token_type: str
+    token: str
+
+    @property
+    def is_authenticated(self):
+        return True
+
+
 class JWTAuth(BasePermission):
     token_prefix = "Bearer"
 
@@ -30,12 +47,31 @@ class JWTAuth(BasePermission):
     
 class JWTUtils:
     @staticmethod
-    def fetch_user_id(request):
-        token = authentication.get_authorization_header(request).decode("utf-8").split()
-        payload = jwt.decode(
-            token[1], SECRET_KEY, algorithms=["HS256"], verify=True
+    def decode_principal(token):
+        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"], verify=True)
+        expiry = payload.get("expiry")
+        return AuthPrincipal(
+            user_id=payload.get("id"),
+            expiry=string_to_date_time(expiry) if expiry else None,
+            token_type=payload.get("tokenType"),
+            token=token,
         )
-        user_id = payload.get("id")
+
+    @staticmethod
+    def fetch_principal(request):
+        """
+        Return the principal JWTAuth attached to the request, decoding the
+        Authorization header only for views that are not authenticated.
+        """
+        principal = getattr(request, "user", None)
+        if isinstance(principal, AuthPrincipal):
+            return principal
+        token = authentication.get_authorization_header(request).decode("utf-8").split()
+        return JWTUtils.decode_principal(token[1])
+
+    @staticmethod
+    def fetch_user_id(request):
+        user_id = JWTUtils.fetch_principal(request).user_id
         if user_id is None:
             raise Exception(
                 "The corresponding JWT token does not contain the 'user_id' key"
@@ -44,11 +80,7 @@ class JWTUtils:
     
     @staticmethod
     def fetch_expiry(request):
-        token = authentication.get_authorization_header(request).decode("utf-8").split()
-        payload = jwt.decode(
-            token[1], SECRET_KEY, algorithms=["HS256"], verify=True
-        )
-        expiry = datetime.strptime(payload.get("expiry"), "%Y-%m-%d %H:%M:%S%z")
+        expiry = JWTUtils.fetch_principal(request).expiry
         if expiry is None:
             raise Exception(
                 "The corresponding JWT token does not contain the 'expiry' key"
@@ -56,29 +88,33 @@ class JWTUtils:
         return expiry
         
     @staticmethod
-    def is_jwt_authenticated(request):
+    def get_bearer_token(request):
         token_prefix = "Bearer"
-        try:
-            auth_header = get_authorization_header(request).decode("utf-8")
-            if not auth_header or not auth_header.startswith(token_prefix):
-                raise UnauthorizedAccessException("Invalid token header")
-
-            token = auth_header[len(token_prefix):].strip()
-            existing_token = Token.objects.filter(token=token).first()
-            if existing_token:
-                raise UnauthorizedAccessException("Expired Token")
-            if not token:
-                raise UnauthorizedAccessException("Empty Token")
-            
-            payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"], verify=True)
+        auth_header = get_authorization_header(request).decode("utf-8")
+        if not auth_header or not auth_header.startswith(token_prefix):
+            raise UnauthorizedAccessException("Invalid token header")
 
-            user_id = payload.get("id")
-            expiry = datetime.strptime(payload.get("expiry"), "%Y-%m-%d %H:%M:%S%z")
+        token = auth_header[len(token_prefix):].strip()
+        if not token:
+            raise UnauthorizedAccessException("Empty Token")
+        return token
 
-            if not user_id or expiry < get_utc_time():
-                raise UnauthorizedAccessException("Token Expired or Invalid")
+    @staticmethod
+    def validate_token(token, revoked):
+        if revoked:
+            raise UnauthorizedAccessException("Expired Token")
 
-            return None, payload
+        principal = JWTUtils.decode_principal(token)
+
+        if not principal.user_id or not principal.expiry or principal.expiry < datetime.now(timezone.utc):
+            raise UnauthorizedAccessException("Token Expired or Invalid")
+        return principal
+
+    @staticmethod
+    @contextmanager
+    def authentication_errors():
+        try:
+            yield
         except jwt.exceptions.InvalidSignatureError as e:
             raise UnauthorizedAccessException(
                 {
@@ -105,6 +141,18 @@ class JWTUtils:
                     "statusCode": 401,
                 }
             ) from e
+
+    @staticmethod
+    def is_jwt_authenticated(request):
+        with JWTUtils.authentication_errors():
+            token = JWTUtils.get_bearer_token(request)
+            return JWTUtils.validate_token(token, revocation_cache.is_revoked(token)), token
+
+    @staticmethod
+    async def ais_jwt_authenticated(request):
+        with JWTUtils.authentication_errors():
+            token = JWTUtils.get_bearer_token(request)
+            return JWTUtils.validate_token(token, await revocation_cache.ais_revoked(token)), token
             
             
     @staticmethod
@@ -0,0 +1,77 @@
+import json
+import uuid
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# U+2028 and U+2029 are valid JSON but end a line in JavaScript; DRF escapes them
+LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+_encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+class PreEncodedJSON:
+    """
+    A JSON document that is already encoded, e.g. read from a cache. Put it
+    in a CustomResponse envelope and FastJSONRenderer splices the bytes in
+    as they are instead of decoding and encoding them again.
+    """
+    __slots__ = ('content',)
+
+    def __init__(self, content):
+        self.content = content
+
+
+def _default(obj):
+    if isinstance(obj, PreEncodedJSON):
+        # Only envelope values are spliced; deeper ones are decoded
+        return json.loads(obj.content)
+    return _encoder.default(obj)
+
+
+def dumps(data):
+    """
+    Encode `data` as compact UTF-8 JSON bytes, with orjson when it is
+    installed. Types orjson does not know go through DRF's JSONEncoder, so
+    the output matches JSONRenderer's.
+    """
+    if orjson is not None:
+        content = orjson.dumps(data, default=_default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+    else:
+        content = JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=_default).encode(data).encode('utf-8')
+    for separator, escaped in LINE_SEPARATORS:
+        if separator in content:
+            content = content.replace(separator, escaped)
+    return content
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson (falling back to the standard
+    library when it is missing) and splices PreEncodedJSON values of the
+    response envelope in as raw bytes.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        fragments = {}
+        if isinstance(data, dict) and any(isinstance(value, PreEncodedJSON) for value in data.values()):
+            data = dict(data)
+            for key, value in data.items():
+                if isinstance(value, PreEncodedJSON):
+                    placeholder = uuid.uuid4().hex
+                    fragments[f'"{placeholder}"'.encode('ascii')] = value.content
+                    data[key] = placeholder
+
+        content = dumps(data)
+        for placeholder, fragment in fragments.items():
+            content = content.replace(placeholder, fragment, 1)
+        return content
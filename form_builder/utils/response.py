@@ -1,6 +1,8 @@
 from typing import Any, Dict, List
+from django.http import StreamingHttpResponse
 from rest_framework import status
 from rest_framework.response import Response
+from .renderers import FastJSONRenderer,dumps
 
 
 
@@ -29,6 +31,18 @@ class CustomResponse:
             status=status.HTTP_200_OK,
         )
 
+    def get_accepted_response(self) -> Response:
+
+        return Response(
+            data={
+                "hasError": False,
+                "statusCode": status.HTTP_202_ACCEPTED,
+                "message": self.message,
+                "response": self.response,
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
+
     def get_failure_response(
             self,
             status_code: int = 400,
@@ -58,3 +72,38 @@ class CustomResponse:
             },
             status=status.HTTP_401_UNAUTHORIZED,
         )
+
+
+def render_response(response: Response) -> Response:
+    """
+    Render a DRF Response outside an APIView, as async views must.
+    """
+    response.accepted_renderer = FastJSONRenderer()
+    response.accepted_media_type = response.accepted_renderer.media_type
+    response.renderer_context = {}
+    return response.render()
+
+
+def stream_json_array(queryset, serializer_class, chunk_size: int = 500) -> StreamingHttpResponse:
+    """
+    Stream `queryset` as a JSON array, serializing it `chunk_size` rows at a
+    time so memory stays flat regardless of the number of rows.
+    """
+    def serialize(rows):
+        return dumps(list(serializer_class(rows, many=True).data))[1:-1]
+
+    def generate():
+        yield b"["
+        chunk = []
+        first = True
+        for row in queryset.iterator(chunk_size=chunk_size):
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield (b"" if first else b",") + serialize(chunk)
+                first = False
+                chunk = []
+        if chunk:
+            yield (b"" if first else b",") + serialize(chunk)
+        yield b"]"
+
+    return StreamingHttpResponse(generate(), content_type="application/json")
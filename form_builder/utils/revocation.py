@@ -0,0 +1,100 @@
+import threading
+import time
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from user.models import Token
+
+# Longest a revocation may take to commit and still be picked up by the
+# incremental sync; anything slower is caught by the next full reload.
+SYNC_OVERLAP = timedelta(seconds=60)
+
+
+class RevocationCache:
+    """
+    Per-process view of the revoked-token table, keyed by token digest.
+
+    The set of unexpired revoked digests is kept in memory and topped up at
+    most once every `sync_interval` seconds, so checking a token that was
+    never revoked costs no query. A sync re-reads every row created since
+    the previous sync started, less SYNC_OVERLAP: ids and creation times are
+    taken before commit, so a row can become visible after rows that were
+    created later, and the overlap catches it. Every `reload_interval`
+    seconds the whole table is read again as a backstop. Entries are dropped
+    once their token has expired, since expired tokens are rejected on
+    their own. A token revoked by another process is picked up within
+    `sync_interval` seconds.
+    """
+
+    def __init__(self, sync_interval=None, reload_interval=None):
+        self.sync_interval = sync_interval
+        self.reload_interval = reload_interval
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.revoked = {}
+        self.synced_from = None
+        self.last_sync = None
+        self.last_reload = None
+
+    def get_sync_interval(self):
+        if self.sync_interval is not None:
+            return self.sync_interval
+        return getattr(settings, 'JWT_REVOCATION_SYNC_SECONDS', 5)
+
+    def get_reload_interval(self):
+        if self.reload_interval is not None:
+            return self.reload_interval
+        return getattr(settings, 'JWT_REVOCATION_RELOAD_SECONDS', 300)
+
+    def sync(self):
+        now = timezone.now()
+        reload = self.last_reload is None or time.monotonic() - self.last_reload >= self.get_reload_interval()
+        rows = Token.objects.filter(expiry__gt=now)
+        if not reload:
+            rows = rows.filter(created_at__gte=self.synced_from - SYNC_OVERLAP)
+
+        revoked = {} if reload else self.revoked
+        legacy = []
+        for token_id, token_hash, expiry in rows.values_list('id', 'token_hash', 'expiry'):
+            if token_hash:
+                revoked[token_hash] = expiry
+            else:
+                legacy.append(token_id)
+        # Rows revoked before token_hash existed and not yet backfilled
+        # (manage.py backfill_token_hashes) are matched by their raw token
+        if legacy:
+            for token, expiry in Token.objects.filter(id__in=legacy).values_list('token', 'expiry'):
+                revoked[Token.hash(token)] = expiry
+
+        self.revoked = {token_hash: expiry for token_hash, expiry in revoked.items() if expiry > now}
+        self.synced_from = now
+        self.last_sync = time.monotonic()
+        if reload:
+            self.last_reload = self.last_sync
+
+    def sync_due(self):
+        return self.last_sync is None or time.monotonic() - self.last_sync >= self.get_sync_interval()
+
+    def is_revoked(self, token):
+        if self.sync_due():
+            with self.lock:
+                if self.sync_due():
+                    self.sync()
+        return Token.hash(token) in self.revoked
+
+    async def ais_revoked(self, token):
+        """
+        Async counterpart of is_revoked; only a due sync leaves the event loop.
+        """
+        if self.sync_due():
+            return await sync_to_async(self.is_revoked)(token)
+        return Token.hash(token) in self.revoked
+
+    def add(self, token_hash, expiry):
+        self.revoked[token_hash] = expiry
+
+
+revocation_cache = RevocationCache()
@@ -0,0 +1,25 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from form_builder.middleware import get_query_budget
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin for views that declare a `query_budget`. assertQueryBudget
+    performs a request through the test client and fails, listing the SQL,
+    when the view resolved for `path` issues more queries than it declares.
+    """
+
+    def assertQueryBudget(self, method, path, data=None, **extra):
+        match = resolve(path)
+        budget = get_query_budget(match.func, method.upper())
+        if budget is None:
+            self.fail(f"View '{match.view_name}' does not declare a query_budget for {method.upper()}")
+
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method.lower())(path, data, **extra)
+        if len(context) > budget:
+            queries = '\n'.join(f"{i}. {query['sql']}" for i, query in enumerate(context.captured_queries, start=1))
+            self.fail(f"View '{match.view_name}' ran {len(context)} queries, over its budget of {budget}:\n{queries}")
+        return response
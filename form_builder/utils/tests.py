@@ -1,3 +1,68 @@
 from django.test import TestCase
 
 # Create your tests here.
+import datetime
+import decimal
+import json
+import uuid
+from unittest import mock
+from django.db import connection
+from rest_framework.renderers import JSONRenderer
+from forms.models import Form,FormField
+from user.models import User
+from utils import renderers
+from utils.ids import uuid7
+from utils.renderers import FastJSONRenderer,PreEncodedJSON
+
+
+class CompactIdTest(TestCase):
+
+    def test_uuid7_ids_are_time_ordered(self):
+        ids = [uuid7() for _ in range(5000)]
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual({value.version for value in ids}, {7})
+        self.assertEqual(len(set(ids)), len(ids))
+
+    def test_ids_are_stored_as_16_bytes_and_read_as_strings(self):
+        user = User.objects.create(username='owner', email='owner@example.com')
+        form = Form.objects.create(user=user, title='Survey')
+        self.assertIsInstance(form.id, str)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT id, user_id FROM {Form._meta.db_table}')
+            stored_id, stored_user_id = cursor.fetchone()
+        self.assertEqual(bytes(stored_id), uuid.UUID(form.id).bytes)
+        self.assertEqual(bytes(stored_user_id), uuid.UUID(user.id).bytes)
+        self.assertEqual(Form.objects.get(pk=form.id).user_id, user.id)
+        self.assertEqual(list(Form.objects.filter(user__pk__in=[user.id]).values_list('id', flat=True)), [form.id])
+
+    def test_unknown_ids_match_nothing(self):
+        self.assertFalse(FormField.objects.filter(pk='not-an-id').exists())
+        self.assertEqual(self.client.get('/api/forms/view/not-an-id/').json()['statusCode'], 404)
+
+
+class FastJSONRendererTest(TestCase):
+    data = {
+        'statusCode': 200,
+        'message': 'caf\u00e9 \u2028 done',
+        'response': {
+            'id': uuid.UUID('0190a0a0-0000-7000-8000-000000000000'),
+            'amount': decimal.Decimal('12.50'),
+            'created_at': datetime.datetime(2024, 7, 1, 12, 30, tzinfo=datetime.timezone.utc),
+            'tags': ('a', 'b'),
+            'counts': {1: 2},
+        },
+    }
+
+    def test_matches_drf_renderer(self):
+        expected = JSONRenderer().render(self.data)
+        self.assertEqual(json.loads(FastJSONRenderer().render(self.data)), json.loads(expected))
+        self.assertIn(b'\\u2028', FastJSONRenderer().render(self.data))
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(FastJSONRenderer().render(self.data), expected)
+
+    def test_pre_encoded_values_are_spliced_in(self):
+        cached = b'[{"id":"1","title":"Survey"}]'
+        content = FastJSONRenderer().render({'statusCode': 200, 'response': PreEncodedJSON(cached)})
+        self.assertEqual(content, b'{"statusCode":200,"response":' + cached + b'}')
+        nested = FastJSONRenderer().render({'response': {'forms': PreEncodedJSON(cached)}})
+        self.assertEqual(json.loads(nested), {'response': {'forms': json.loads(cached)}})
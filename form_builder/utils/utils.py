@@ -4,6 +4,7 @@ import pytz
 from datetime import datetime, timedelta
 from .types import TokenType
 from user.models import Token
+from .revocation import revocation_cache
 from form_builder.settings import SECRET_KEY
 
 def format_time(date_time):
@@ -18,7 +19,10 @@ def get_utc_time() -> datetime:
 
 
 def string_to_date_time(dt_str):
-    return datetime.strptime(dt_str, "%Y-%m-%d %H:%M:%S%z")
+    try:
+        return datetime.fromisoformat(dt_str)
+    except ValueError:
+        return datetime.strptime(dt_str, "%Y-%m-%d %H:%M:%S%z")
 
 
 def generate_jwt(user):
@@ -56,12 +60,13 @@ def get_refresh_expiry(token):
      payload = jwt.decode(
             token, SECRET_KEY, algorithms=["HS256"], verify=True
         )
-     expiry = datetime.strptime(payload.get("expiry"), "%Y-%m-%d %H:%M:%S%z")
+     expiry = string_to_date_time(payload.get("expiry"))
      return expiry
 
     
 def mark_token_expired(token,user,token_type,expiry):
-    Token.objects.create(user=user,token=token,token_type=token_type,expiry=expiry)
+    revoked = Token.objects.create(user=user,token=token,token_type=token_type,expiry=expiry)
+    revocation_cache.add(revoked.token_hash, expiry)
     
 def sort_nested_list(data):
     for key, value in data.items():